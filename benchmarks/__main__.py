@@ -0,0 +1,145 @@
+"""Benchmark the extraction pipeline on a synthetic library.
+
+Generates a library in a temporary folder, times every stage of the
+pipeline and prints the results as JSON, which can be saved and
+compared to the results of another commit:
+
+    python -m benchmarks run --output before.json
+    python -m benchmarks run --output after.json
+    python -m benchmarks compare before.json after.json
+
+Everything runs offline, with its own papis configuration and cache.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from benchmarks.library import LibraryParams, generate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark suite")
+    defaults = LibraryParams()
+    for name, value in defaults.asdict().items():
+        run_parser.add_argument(
+            f"--{name.replace('_', '-')}", type=type(value), default=value
+        )
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--only", help="only run stages starting with this")
+    run_parser.add_argument("--output", type=Path, help="write results to file")
+
+    compare_parser = commands.add_parser("compare", help="compare two results")
+    compare_parser.add_argument("base", type=Path)
+    compare_parser.add_argument("new", type=Path)
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare(json.loads(args.base.read_text()), json.loads(args.new.read_text()))
+        return
+
+    params = LibraryParams(**{name: getattr(args, name) for name in defaults.asdict()})
+    results = run(params, args.repeat, args.only)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+
+
+def run(params: LibraryParams, repeat: int, only: str | None) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="papis-extract-bench-") as tmp:
+        root = Path(tmp)
+        library = generate(root / "library", params)
+        _configure(root, library)
+
+        # only import now, so that papis picks up the benchmark configuration
+        from benchmarks.suite import measure, stages
+
+        results: dict[str, Any] = {}
+        for stage in stages(library):
+            # later stages depend on the query and extraction stages
+            required = stage.name in ("query", "classify") or stage.name.startswith(
+                "extract."
+            )
+            if only and not stage.name.startswith(only) and not required:
+                continue
+            print(f"Running {stage.name}...", file=sys.stderr)
+            results[stage.name] = measure(stage, repeat)
+
+    return {"meta": _meta(params, repeat), "stages": results}
+
+
+def compare(base: dict[str, Any], new: dict[str, Any]) -> None:
+    print(f"base: {base['meta'].get('commit')}, new: {new['meta'].get('commit')}")
+    print(f"{'stage':<24}{'base':>10}{'new':>10}{'time':>9}{'memory':>9}")
+    for name, stage in new["stages"].items():
+        old = base["stages"].get(name)
+        if not old:
+            print(f"{name:<24}{'-':>10}{stage['seconds']:>9.3f}s")
+            continue
+        print(
+            f"{name:<24}{old['seconds']:>9.3f}s{stage['seconds']:>9.3f}s"
+            f"{_change(old['seconds'], stage['seconds']):>9}"
+            f"{_change(old['peak_memory'], stage['peak_memory']):>9}"
+        )
+
+
+def _change(old: float, new: float) -> str:
+    if not old:
+        return "-"
+    return f"{(new - old) / old:+.1%}"
+
+
+def _configure(root: Path, library: Path) -> None:
+    config = root / "config" / "papis" / "config"
+    config.parent.mkdir(parents=True)
+    config.write_text(
+        "[settings]\n"
+        "default-library = bench\n"
+        "database-backend = papis\n"
+        f"cache-dir = {root / 'cache'}\n"
+        "[bench]\n"
+        f"dir = {library}\n"
+        "[plugins.extract]\n"
+        'tags = {"red": "important", "blue": "toread"}\n'
+        "cache = False\n"
+    )
+    os.environ["XDG_CONFIG_HOME"] = str(config.parent.parent)
+    os.environ["XDG_CACHE_HOME"] = str(root / "cache")
+    os.environ["PAPIS_CACHE_DIR"] = str(root / "cache")
+
+
+def _meta(params: LibraryParams, repeat: int) -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "library": params.asdict(),
+        "repeat": repeat,
+    }
+
+
+if __name__ == "__main__":
+    main()
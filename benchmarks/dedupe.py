@@ -0,0 +1,63 @@
+"""Compare duplicate detection against large notes.
+
+Times dropping already existing annotations from a note with the
+indexed lookup against comparing every annotation to every line.
+
+    python benchmarks/dedupe.py [note lines] [new annotations]
+"""
+
+import random
+import string
+import sys
+import time
+
+import Levenshtein
+
+from papis_extract.similarity import SimilarityIndex
+
+MINIMUM_SIMILARITY = 0.75
+
+
+def quote(rng: random.Random) -> str:
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))]
+    words += [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+        for _ in range(rng.randint(2, 80))
+    ]
+    return f"> {' '.join(words)} [p. {rng.randint(1, 400)}]"
+
+
+def brute_force(annotations: list[str], lines: list[str]) -> list[str]:
+    return [
+        an
+        for an in annotations
+        if not any(Levenshtein.ratio(an, line) > MINIMUM_SIMILARITY for line in lines)
+    ]
+
+
+def indexed(annotations: list[str], lines: list[str]) -> list[str]:
+    index = SimilarityIndex(lines)
+    return [an for an in annotations if index.find(an, MINIMUM_SIMILARITY) is None]
+
+
+def main(note_lines: int = 5000, new_annotations: int = 200) -> None:
+    rng = random.Random(0)
+    # notes separate their annotations with empty lines
+    lines = [line for _ in range(note_lines // 2) for line in (f"{quote(rng)}\n", "\n")]
+    # half of the annotations already exist in the note, half are new
+    annotations = [
+        line.rstrip("\n") for line in rng.sample(lines[::2], new_annotations // 2)
+    ]
+    annotations += [quote(rng) for _ in range(new_annotations - len(annotations))]
+
+    results: dict[str, float] = {}
+    for name, fn in [("brute force", brute_force), ("indexed", indexed)]:
+        start = time.perf_counter()
+        remaining = fn(annotations, lines)
+        results[name] = time.perf_counter() - start
+        print(f"{name:>12}: {results[name]:.3f}s, {len(remaining)} new annotations")
+    print(f"{'speedup':>12}: {results['brute force'] / results['indexed']:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
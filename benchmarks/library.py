@@ -0,0 +1,185 @@
+# pyright: strict, reportMissingTypeStubs=false, reportUnknownMemberType=false
+"""Generate a synthetic papis library to benchmark extraction on.
+
+Every document gets a PDF with highlights and notes, while some of them
+additionally get ReadEra, Readest or PocketBook export files. The library
+only depends on the passed parameters and the random seed, so that results
+stay comparable between runs.
+"""
+
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import pymupdf as mu
+
+WORDS = [
+    "the",
+    "of",
+    "annotation",
+    "reading",
+    "library",
+    "highlight",
+    "paper",
+    "theory",
+    "note",
+    "method",
+    "result",
+    "figure",
+    "model",
+    "data",
+    "analysis",
+    "argument",
+    "chapter",
+    "evidence",
+    "claim",
+    "context",
+    "source",
+    "history",
+    "concept",
+    "process",
+    "system",
+    "structure",
+    "language",
+]
+COLORS = [(1.0, 0.0, 0.0), (0.0, 0.0, 1.0), (1.0, 1.0, 0.0), (0.0, 1.0, 0.0)]
+POCKETBOOK_COLORS = ["red", "blue", "yellow", "green"]
+
+FONT_SIZE = 11
+LINE_HEIGHT = 16
+LINES_PER_PAGE = 40
+
+
+@dataclass
+class LibraryParams:
+    documents: int = 50
+    # pages of every PDF
+    pages: int = 20
+    # average highlights per PDF page, with every third one carrying a note
+    density: float = 2.0
+    # every n-th document gets each kind of text export file
+    exports_every: int = 5
+    # annotations in every export file
+    export_annotations: int = 50
+    seed: int = 0
+
+    def asdict(self) -> dict[str, float | int]:
+        return asdict(self)
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(WORDS, k=words))
+
+
+def generate(root: Path, params: LibraryParams) -> Path:
+    """Create the library in the root folder and return it."""
+    rng = random.Random(params.seed)
+    root.mkdir(parents=True, exist_ok=True)
+    for nr in range(params.documents):
+        folder = root / f"doc{nr:05}"
+        folder.mkdir()
+        files = ["document.pdf"]
+        make_pdf(folder / "document.pdf", params, rng)
+        if params.exports_every and nr % params.exports_every == 0:
+            make_readera(folder / "readera.txt", params, rng)
+            make_readest(folder / "readest.md", params, rng)
+            make_pocketbook(folder / "pocketbook.html", params, rng)
+            files += ["readera.txt", "readest.md", "pocketbook.html"]
+        info = [
+            f"title: {sentence(rng, 5)}",
+            f"author: Author {nr}",
+            f"ref: ref{nr}",
+            "notes: notes.md",
+            "files:",
+            *[f"- {f}" for f in files],
+        ]
+        (folder / "info.yaml").write_text("\n".join(info) + "\n")
+    return root
+
+
+def make_pdf(path: Path, params: LibraryParams, rng: random.Random) -> None:
+    highlights = round(params.pages * params.density)
+    targets = [
+        (rng.randrange(params.pages), rng.randrange(LINES_PER_PAGE))
+        for _ in range(highlights)
+    ]
+    by_page: dict[int, set[int]] = {}
+    for page_nr, line_nr in targets:
+        by_page.setdefault(page_nr, set()).add(line_nr)
+
+    with mu.open() as doc:
+        for page_nr in range(params.pages):
+            page = doc.new_page()
+            lines = [sentence(rng, 10) for _ in range(LINES_PER_PAGE)]
+            for i, line in enumerate(lines):
+                page.insert_text((72, 72 + i * LINE_HEIGHT), line, fontsize=FONT_SIZE)
+            for i in sorted(by_page.get(page_nr, ())):
+                y = 72 + i * LINE_HEIGHT
+                width = mu.get_text_length(lines[i], fontsize=FONT_SIZE)
+                annot = page.add_highlight_annot(
+                    mu.Rect(72, y - FONT_SIZE, 72 + width, y + 3)
+                )
+                annot.set_colors(stroke=rng.choice(COLORS))
+                if i % 3 == 0:
+                    annot.set_info(content=sentence(rng, 6))
+                annot.update()
+        doc.save(path)
+
+
+def make_readera(path: Path, params: LibraryParams, rng: random.Random) -> None:
+    entries: list[str] = []
+    for i in range(params.export_annotations):
+        entry = sentence(rng, rng.randint(5, 40))
+        if i % 3 == 0:
+            entry += f"\n--{sentence(rng, 6)}"
+        entries.append(entry)
+    path.write_text(
+        f"{sentence(rng, 4)}\nSome Author\n\n"
+        + "".join(f"{entry}\n\n*****\n\n" for entry in entries)
+    )
+
+
+def make_readest(path: Path, params: LibraryParams, rng: random.Random) -> None:
+    lines = [
+        f"# {sentence(rng, 4)}",
+        "**Author**: Some Author",
+        "",
+        "**Exported from Readest**: 2025-01-01",
+        "",
+        "---",
+        "",
+        "## Highlights & Annotations",
+        "",
+    ]
+    for i in range(params.export_annotations):
+        if i % 10 == 0:
+            lines += [f"### {sentence(rng, 3)}"]
+        lines += [f'> "{sentence(rng, rng.randint(5, 40))}"']
+        if i % 3 == 0:
+            lines += [f"**Note**:: {sentence(rng, 6)}"]
+        lines += [""]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def make_pocketbook(path: Path, params: LibraryParams, rng: random.Random) -> None:
+    bookmarks: list[str] = []
+    for i in range(params.export_annotations):
+        note = (
+            f'<div class="bm-note"><p>{sentence(rng, 6)}</p></div>'
+            if i % 3 == 0
+            else ""
+        )
+        bookmarks.append(
+            f'<div class="bookmark bm-color-{rng.choice(POCKETBOOK_COLORS)}">'
+            f'<p class="bm-page">{i + 1}</p>'
+            f'<div class="bm-text"><p>{sentence(rng, rng.randint(5, 40))}</p></div>'
+            f"{note}</div>"
+        )
+    path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml"><head>'
+        '<meta name="generator" content="PocketBook Bookmarks Export"/>'
+        f"<title>{sentence(rng, 4)}</title></head><body>"
+        + "".join(bookmarks)
+        + "</body></html>\n"
+    )
@@ -0,0 +1,167 @@
+"""The stages of the extraction pipeline to benchmark.
+
+Every stage consists of a setup, which is not measured, and the measured
+work itself, which returns the amount of items it processed. Stages are
+first timed without tracing memory, then run once more under tracemalloc
+to find their peak memory use.
+"""
+
+import gc
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import papis.config
+import papis.database
+from papis.document import Document
+
+from papis_extract import classifier
+from papis_extract.annotation import Annotation
+from papis_extract.exporters.notes import NotesExporter
+from papis_extract.extractors import all_extractors
+from papis_extract.formatter import formatted_blocks, formatters
+from papis_extract.similarity import SimilarityIndex
+
+
+@dataclass
+class Stage:
+    name: str
+    # returns the argument handed to the run function
+    setup: Callable[[], Any]
+    # returns the amount of processed items
+    run: Callable[[Any], int]
+
+
+def measure(stage: Stage, repeat: int) -> dict[str, float | int]:
+    timings: list[float] = []
+    items = 0
+    for _ in range(repeat):
+        arg = stage.setup()
+        gc.collect()
+        start = time.perf_counter()
+        items = stage.run(arg)
+        timings.append(time.perf_counter() - start)
+
+    arg = stage.setup()
+    gc.collect()
+    tracemalloc.start()
+    stage.run(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        "seconds": best,
+        "mean_seconds": sum(timings) / len(timings),
+        "items": items,
+        "items_per_second": items / best if best else 0.0,
+        "peak_memory": peak,
+    }
+
+
+def stages(library: Path) -> list[Stage]:
+    """Return all benchmark stages for the library.
+
+    The query stage has to run first, since all later stages work on
+    the documents and annotations found by the earlier ones.
+    """
+    db = papis.database.get()
+    documents: list[Document] = []
+    files: list[Path] = []
+    extracted: dict[str, list[tuple[Document, list[Annotation]]]] = {}
+
+    def query(_: None) -> int:
+        documents[:] = db.query(papis.database.get_all_query_string())
+        files[:] = [Path(f) for doc in documents for f in doc.get_files()]
+        return len(documents)
+
+    def classify(_: None) -> int:
+        for f in files:
+            classifier.classify(f)
+        return len(files)
+
+    result = [
+        Stage("query", db.clear, query),
+        Stage("classify", classifier.clear_cache, classify),
+    ]
+
+    for name, extractor in all_extractors.items():
+
+        def extract(_: None, name: str = name, extractor: Any = extractor) -> int:
+            per_doc: list[tuple[Document, list[Annotation]]] = []
+            for doc in documents:
+                annots = [
+                    a
+                    for f in doc.get_files()
+                    if extractor.can_process(Path(f))
+                    for a in extractor.run(Path(f))
+                ]
+                per_doc.append((doc, annots))
+            extracted[name] = per_doc
+            return sum(len(annots) for _, annots in per_doc)
+
+        result.append(Stage(f"extract.{name}", lambda: None, extract))
+
+    def all_annotations() -> list[tuple[Document, list[Annotation]]]:
+        return [
+            (doc, [a for per_doc in extracted.values() for a in per_doc[i][1]])
+            for i, doc in enumerate(documents)
+        ]
+
+    for name, formatter in formatters.items():
+
+        def format_all(doc_annots: Any, formatter: Any = formatter) -> int:
+            for i, (doc, annots) in enumerate(doc_annots):
+                "".join(formatted_blocks(formatter, doc, annots, first=i == 0))
+            return sum(len(annots) for _, annots in doc_annots)
+
+        result.append(Stage(f"format.{name}", all_annotations, format_all))
+
+    def dedupe_setup() -> tuple[list[str], list[str]]:
+        # a note containing all annotations of the library, and half of them
+        # again next to as many new ones, as if extracted from another book
+        note = "".join(
+            block
+            for doc, annots in all_annotations()
+            for block in formatted_blocks(
+                formatters["markdown-atx"], doc, annots, first=True
+            )
+        )
+        lines = [f"{line}\n" for line in note.splitlines()]
+        quotes = [line.rstrip("\n") for line in lines if line.startswith(">")]
+        new = quotes[::2] + [f"> new {quote[2:]} again" for quote in quotes[1::2]]
+        return new, lines
+
+    def dedupe(args: tuple[list[str], list[str]]) -> int:
+        # the lookup the notes exporter does for every new annotation
+        new, lines = args
+        minimum_similarity = (
+            papis.config.getfloat("minimum_similarity", "plugins.extract") or 1.0
+        )
+        index = SimilarityIndex(lines)
+        for quote in new:
+            index.find(quote, minimum_similarity)
+        return len(new)
+
+    result.append(Stage("dedupe", dedupe_setup, dedupe))
+
+    def remove_notes() -> list[tuple[Document, list[Annotation]]]:
+        for doc in documents:
+            folder = Path(doc.get_main_folder() or "")
+            for note in [folder / "notes.md", folder / ".notes.md.extracted"]:
+                note.unlink(missing_ok=True)
+        return all_annotations()
+
+    def write(doc_annots: Any) -> int:
+        NotesExporter(formatters["markdown-atx"]).run(doc_annots)
+        return sum(len(annots) for _, annots in doc_annots)
+
+    result += [
+        Stage("write", remove_notes, write),
+        # notes and ledgers are left over from the first write
+        Stage("rewrite", all_annotations, write),
+    ]
+    return result
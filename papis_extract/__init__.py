@@ -1,29 +1,58 @@
-import re
-from typing import TYPE_CHECKING
+import contextlib
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, TextIO
 
 if TYPE_CHECKING:
-    from papis_extract.annotation import Annotation
-    from papis_extract.exporter import Exporter
+    from papis_extract.exporters.notes import NotesExporter
 
 import click
 import papis.cli
 import papis.config
-import papis.document
 import papis.logging
 import papis.strings
 from papis.document import Document
 
-from papis_extract import extraction
+from papis_extract import classifier, extraction, profiling
+from papis_extract.annotation import Annotation
+from papis_extract.cache import ExtractionCache
+from papis_extract.exceptions import ExportError
 from papis_extract.exporters import all_exporters
-from papis_extract.extractors import all_extractors
-from papis_extract.formatter import Formatter, formatters
+from papis_extract.exporters.stdout import StdoutExporter
+from papis_extract.extractors import all_extractors, extractors_for
+from papis_extract.formatter import (
+    BlockFormatter,
+    Formatter,
+    custom_formatters,
+    formatters,
+)
+from papis_extract.isolation import Isolation
+from papis_extract.watch import watch as watch_documents
+from papis_extract.watermarks import Watermarks
+from papis_extract.watermarks import default_path as watermarks_path
 
 logger = papis.logging.get_logger(__name__)
 
-DEFAULT_OPTIONS: dict[str, dict[str, bool | float | dict[str, str]]] = {
+DEFAULT_OPTIONS: dict[str, dict[str, bool | int | float | str | dict[str, str]]] = {
     "plugins.extract": {
         "tags": {},
+        "colors": {},  # additional named colors for tagging
+        "formatters": {},  # custom output formats as mustache templates
         "on_import": False,
+        "on_import_formatter": "markdown-atx",  # to write notes with on import
+        "jobs": 1,  # amount of documents to extract in parallel
+        "cache": True,  # re-use annotations of unchanged files
+        "cache_max_size": 100,  # in megabytes
+        "cache_hash_content": False,  # hash files whose timestamp changed
+        "isolate": False,  # extract every file in its own process
+        "file_timeout": 300,  # in seconds, for isolated extraction
+        "file_memory_limit": 0,  # in megabytes, for isolated extraction
+        "watch_debounce": 2.0,  # seconds without changes before extracting
+        "watch_interval": 5.0,  # seconds between checks if inotify is missing
+        "write_jobs": 4,  # notes written in the background, 0 to write in turn
+        "git_batch_size": 0,  # documents per git commit, 0 for a single commit
         "minimum_similarity": 0.75,  # for checking against existing annotations
         "minimum_similarity_content": 0.9,  # for checking if highlight or note
         "minimum_similarity_color": 0.833,  # for matching tag to color
@@ -53,13 +82,18 @@ papis.config.register_default_settings(DEFAULT_OPTIONS)
 @click.option(
     "--output",
     "-o",
-    type=click.Choice(
-        list(formatters.keys()),
-        case_sensitive=False,
+    help=(
+        f"Choose which format to output annotations in: {', '.join(formatters)}"
+        " or any custom formatter."
     ),
-    help="Choose which format to output annotations in.",
     show_default=True,
 )
+@click.option(
+    "--output-file",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default=None,
+    help="Write the output to this file instead, compressed if it ends in .gz.",
+)
 @click.option(
     "--input",
     "-i",
@@ -78,6 +112,60 @@ papis.config.register_default_settings(DEFAULT_OPTIONS)
     help="Do not drop any annotations because they already exist.",
     show_default=True,
 )
+@click.option(
+    "--overwrite/--no-overwrite",
+    help="Replace changed annotations in notes instead of appending them again.",
+    show_default=True,
+)
+@click.option(
+    "--since",
+    type=click.DateTime(),
+    default=None,
+    help="Only extract annotations created or modified after this date.",
+)
+@click.option(
+    "--changed-only",
+    is_flag=True,
+    help="Only extract annotations created or modified since the last such run.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Extract from this many documents in parallel (0 uses all cores).",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=None,
+    help="Re-use annotations of files unchanged since their last extraction.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Print how long each stage of the extraction took.",
+)
+@click.option(
+    "--profile-output",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default=None,
+    help="Write the timings of all stages to a JSON file.",
+)
+@click.option(
+    "--refresh-cache",
+    is_flag=True,
+    help="Extract all files anew and replace their cached annotations.",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Keep running and extract documents again whenever their files change.",
+)
+@click.option(
+    "--isolate/--no-isolate",
+    default=None,
+    help="Extract every file in its own process, skipping files which time out.",
+)
 def main(
     query: str,
     # _papis_id: bool,
@@ -89,8 +177,19 @@ def main(
     write: bool,
     extractors: list[str],
     output: str,
+    output_file: Path | None,
     git: bool,
     duplicates: bool,
+    overwrite: bool,
+    since: datetime | None,
+    changed_only: bool,
+    jobs: int | None,
+    cache: bool | None,
+    refresh_cache: bool,
+    isolate: bool | None,
+    watch: bool,
+    profile: bool,
+    profile_output: Path | None,
 ) -> None:
     """Extract annotations from any documents.
 
@@ -104,65 +203,255 @@ def main(
     optionally run whenever a new document is imported for a papis entry,
     if set in the plugin configuration.
     """
-    documents = papis.cli.handle_doc_folder_query_all_sort(
-        query, doc_folder, sort_field=None, sort_reverse=False, _all=_all
-    )
+    if output_file and write:
+        raise click.UsageError("--output-file can not be used together with --write.")
+    formatter = _formatter(output) if output else None
+    if output and formatter is None:
+        raise click.BadParameter(f"Unknown format '{output}'.", param_hint="--output")
+    if profile or profile_output:
+        profiling.enable()
+
+    with profiling.timed("query"):
+        documents = papis.cli.handle_doc_folder_query_all_sort(
+            query, doc_folder, sort_field=None, sort_reverse=False, _all=_all
+        )
     if not documents:
         logger.warning(papis.strings.no_documents_retrieved_message)
         return
 
-    formatter = formatters.get(output)
+    if jobs is None:
+        configured_jobs = papis.config.getint("jobs", "plugins.extract")
+        jobs = configured_jobs if configured_jobs is not None else 1
+    extraction_cache = _extraction_cache(cache, refresh=refresh_cache)
+    isolation = _isolation(isolate)
+    try:
+        stream = _open_output(output_file)
+    except OSError as e:
+        raise click.ClickException(f"Could not open output file: {e}") from e
 
-    run(
-        documents,
+    extract = partial(
+        run,
         edit=manual,
         write=write,
         git=git,
         formatter=formatter,
         extractors=[all_extractors.get(e) for e in extractors],
         duplicates=duplicates,
+        overwrite=overwrite,
+        since=since.timestamp() if since else 0.0,
+        changed_only=changed_only,
+        jobs=jobs,
+        cache=extraction_cache,
+        isolation=isolation,
+        output=stream,
     )
+    try:
+        if watch:
+            debounce = papis.config.getfloat("watch_debounce", "plugins.extract")
+            interval = papis.config.getfloat("watch_interval", "plugins.extract")
+            watch_documents(
+                documents, extract, debounce=debounce or 0.0, interval=interval or 5.0
+            )
+        else:
+            extract(documents)
+    except ExportError as e:
+        raise click.ClickException(str(e)) from e
+    finally:
+        if stream:
+            stream.close()
+        if profile or profile_output:
+            _report_profile(profile, profile_output)
 
 
 def run(
     documents: list[Document],
-    formatter: Formatter | None,
+    formatter: Formatter | BlockFormatter | None,
     extractors: list[extraction.Extractor | None],
     edit: bool = False,
     write: bool = False,
     git: bool = False,
     duplicates: bool = False,
+    overwrite: bool = False,
+    since: float = 0.0,
+    changed_only: bool = False,
+    jobs: int = 1,
+    cache: ExtractionCache | None = None,
+    isolation: Isolation | None = None,
+    output: TextIO | None = None,
 ) -> None:
-    exporter: Exporter
+    exporter: NotesExporter | StdoutExporter
     if write:
-        exporter = all_exporters["notes"](
+        # only imported when writing, since it pulls in papis.notes
+        from papis_extract.exporters import notes
+
+        exporter = notes.NotesExporter(
             formatter=formatter or formatters["markdown-atx"],
             edit=edit,
             git=git,
             duplicates=duplicates,
+            overwrite=overwrite,
+            # isolated extractions fork, which must not happen with writer threads
+            write_jobs=0 if isolation else None,
         )
     else:
-        exporter = all_exporters["stdout"](
-            formatter=formatter or formatters["markdown"]
+        exporter = StdoutExporter(
+            formatter=formatter or formatters["markdown"], output=output
         )
 
-    doc_annots: list[tuple[Document, list[Annotation]]] = []
-    for doc in documents:
-        annotations: list[Annotation] = []
-        valid_files: int = 0
-        for ext in extractors:
-            if not ext:
-                continue
-            added = extraction.start(ext, doc)
-            if added is not None:
-                valid_files += 1
-                annotations.extend(added)
-        doc_annots.append((doc, annotations))
-
-        if valid_files == 0:
-            # have to remove curlys or papis logger gets upset
-            desc = re.sub("[{}]", "", papis.document.describe(doc))
-            logger.info(
-                f"Document {desc} has no valid extractors for any of its files."
-            )
+    watermarks = (
+        Watermarks(watermarks_path("notes" if write else "stdout"))
+        if changed_only
+        else None
+    )
+
+    def threshold(doc: Document) -> float:
+        return max(since, watermarks.get(doc) if watermarks else 0.0)
+
+    doc_annots = extraction.start_all(
+        documents,
+        [ext for ext in extractors if ext],
+        jobs=jobs,
+        cache=cache,
+        isolation=isolation,
+        since=threshold if since or watermarks is not None else None,
+    )
+    if watermarks is not None:
+        doc_annots = _track_watermarks(doc_annots, watermarks)
+    # extraction happens lazily while the exporter consumes the documents
     exporter.run(doc_annots)
+    if watermarks is not None:
+        watermarks.save()
+    if cache:
+        cache.evict()
+
+
+def on_add_done(document: Document) -> None:
+    """Extract the annotations of a newly added document into its note.
+
+    Runs as papis `on_add_done` hook if `on_import` is set in the plugin
+    configuration. Only the files of the new document are extracted, so
+    adding documents does not have to query the whole library.
+
+    The hook runs before the document is moved into the library, so it is
+    not part of the library database yet; its note is created in its
+    temporary folder and moved into the library together with it.
+    """
+    if not papis.config.getboolean("on_import", "plugins.extract"):
+        return
+
+    kinds: set[str] = set()
+    for file in document.get_files():
+        with contextlib.suppress(OSError):
+            kinds.add(classifier.classify(Path(file)).kind)
+    if not kinds:
+        return
+
+    # only load the extractors needed for the files of the document; the files
+    # are still in a temporary folder, so caching them would never pay off
+    annotations = extraction.start_document(
+        document, extractors_for(kinds), isolation=_isolation(None)
+    )
+    if not annotations:
+        return
+
+    name = papis.config.getstring("on_import_formatter", "plugins.extract")
+    formatter = _formatter(name)
+    if formatter is None:
+        logger.warning(f"Unknown formatter '{name}' to write notes on import.")
+        formatter = formatters["markdown-atx"]
+    if "notes" not in document:
+        _name_notes(document)
+
+    try:
+        all_exporters["notes"](formatter=formatter).run([(document, annotations)])
+    except ExportError as e:
+        logger.error(f"Could not extract annotations on import: {e}")
+
+
+def _name_notes(document: Document) -> None:
+    """Set the name of the document note, following the papis 'notes-name'.
+
+    Does the same as :func:`papis.notes.notes_path`, but without updating the
+    document in the database, which it is not part of yet while being added.
+    """
+    from papis.format import format
+    from papis.paths import normalize_path_part
+
+    notes_name = format(
+        papis.config.getformatpattern("notes-name"), document, default="notes.tex"
+    )
+    document["notes"] = normalize_path_part(notes_name)
+    document.save()
+
+
+def _track_watermarks(
+    doc_annots: Iterable[tuple[Document, list[Annotation]]], watermarks: Watermarks
+) -> Iterator[tuple[Document, list[Annotation]]]:
+    for doc, annots in doc_annots:
+        yield doc, annots
+        # only reached once the exporter is done with the document
+        watermarks.update(doc, annots)
+
+
+def _formatter(name: str) -> Formatter | BlockFormatter | None:
+    """Return the built-in or custom formatter of the name, if there is one.
+
+    Custom formatters are only read from the configuration once they are
+    needed, so that any configuration passed on the command line applies.
+    """
+    available = {**formatters, **custom_formatters()}
+    if name in available:
+        return available[name]
+    return {key.lower(): f for key, f in available.items()}.get(name.lower())
+
+
+def _extraction_cache(enabled: bool | None, refresh: bool) -> ExtractionCache | None:
+    """Return the extraction cache, if enabled or else if set in the config."""
+    if enabled is None:
+        enabled = papis.config.getboolean("cache", "plugins.extract")
+    if not enabled:
+        return None
+    cache_size = papis.config.getint("cache_max_size", "plugins.extract") or 0
+    return ExtractionCache(
+        max_size=cache_size * 1024 * 1024,
+        hash_content=bool(
+            papis.config.getboolean("cache_hash_content", "plugins.extract")
+        ),
+        refresh=refresh,
+    )
+
+
+def _isolation(enabled: bool | None) -> Isolation | None:
+    """Return the isolation of extractions, if enabled or else if set in the config."""
+    if enabled is None:
+        enabled = papis.config.getboolean("isolate", "plugins.extract")
+    if not enabled:
+        return None
+    memory_limit = papis.config.getint("file_memory_limit", "plugins.extract")
+    return Isolation(
+        timeout=papis.config.getfloat("file_timeout", "plugins.extract") or 0.0,
+        memory=(memory_limit or 0) * 1024 * 1024,
+    )
+
+
+def _open_output(path: Path | None) -> TextIO | None:
+    """Open the file to write the output to, gzip-compressed if it ends in .gz."""
+    if path is None:
+        return None
+    if path.suffix == ".gz":
+        import gzip
+
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return path.open("w", encoding="utf-8", newline="")
+
+
+def _report_profile(summary: bool, output: Path | None) -> None:
+    profile = profiling.current()
+    if profile is None:
+        return
+    if summary:
+        click.echo(profile.summary(), err=True)
+    if output:
+        profile.write(output)
+        logger.info(f"Wrote extraction profile to {output}.")
+    profiling.disable()
@@ -1,25 +1,50 @@
-import math
-from functools import total_ordering
+import sys
+from collections.abc import Iterable
+from functools import lru_cache, total_ordering
 from types import NotImplementedType
 from typing import Any, cast
 
-import chevron
-import papis.config
 from papis.document import Document
 
-COLOR_SIMILARITY_MINIMUM_FALLBACK = 0.833
+from papis_extract import colors
 
-COLORS: dict[str, tuple[float, float, float]] = {
-    "blue": (0, 0, 1),
-    "green": (0, 1, 0),
-    "red": (1, 0, 0),
-    "cyan": (0, 1, 1),
-    "yellow": (1, 1, 0),
-    "magenta": (1, 0, 1),
-    "purple": (0.5, 0, 0.5),
-    "pink": (1, 0.75, 0.8),
-    "orange": (1, 0.65, 0),
-}
+# re-exported, since they used to be defined here
+COLORS = colors.COLORS
+COLOR_SIMILARITY_MINIMUM_FALLBACK = colors.COLOR_SIMILARITY_MINIMUM_FALLBACK
+
+# a mustache template, already split into its tokens
+Template = tuple[tuple[str, str], ...]
+
+
+@lru_cache(maxsize=64)
+def compile_template(template: str) -> Template:
+    """Tokenize a mustache template once.
+
+    Returns the tokens of the template which can be rendered directly,
+    without having to parse the template again for every annotation.
+    Templates are cached, so compiling the same template again is free.
+    """
+    import chevron.tokenizer
+
+    return tuple(chevron.tokenizer.tokenize(template))
+
+
+# the rgb colors used by annotations, shared between all annotations using them
+_color_table: dict[tuple[float, float, float], tuple[float, float, float]] = {}
+COLOR_TABLE_MAXIMUM = 1024
+
+
+def _shared_color(color: tuple[float, float, float]) -> tuple[float, float, float]:
+    """Return a shared tuple of the color.
+
+    Extractors often hand over colors as lists or as fresh tuples for every
+    annotation; since readers only use a handful of colors, all annotations
+    instead share a single tuple per distinct color.
+    """
+    color = cast("tuple[float, float, float]", tuple(color))
+    if len(_color_table) >= COLOR_TABLE_MAXIMUM:
+        return _color_table.get(color, color)
+    return _color_table.setdefault(color, color)
 
 
 @total_ordering
@@ -27,8 +52,25 @@ class Annotation:
     """A PDF annotation object.
 
     Contains all information necessary for the annotation itself, content and metadata.
+
+    Annotations are kept compact since a lot of them are held in memory during
+    extraction: they use slots, intern their file path so that annotations of
+    the same file share it, and share their color tuples.
     """
 
+    __slots__ = (
+        "_color",
+        "_minimum_similarity_color",
+        "_tag",
+        "content",
+        "file",
+        "id",
+        "modified",
+        "note",
+        "page",
+        "type",
+    )
+
     def __init__(
         self,
         file: str,
@@ -39,26 +81,55 @@ class Annotation:
         tag: str = "",
         type: str = "Highlight",
         minimum_similarity_color: float | None = None,
+        id: str = "",
+        modified: float = 0.0,
     ) -> None:
-        self.file = file
-        self._color = color
+        self.file = sys.intern(file)
+        self._color = _shared_color(color)
         self.content = content
         self.note = note
         self.page = page
-        self.minimum_similarity_color = minimum_similarity_color or (
-            papis.config.getfloat("minimum_similarity_color", "plugins.extract")
-            or COLOR_SIMILARITY_MINIMUM_FALLBACK
-        )
-        self.tag = tag or self._tag_from_colorname(self.colorname or "")
+        self._minimum_similarity_color = minimum_similarity_color
+        # derived from the color on first access if not given
+        self._tag = tag or None
         self.type = type
+        # identifies the annotation within its file, if the file format has ids;
+        # only informational, changes are recognized by content and timestamp
+        self.id = id
+        # timestamp of the last change to the annotation, 0 if unknown
+        self.modified = modified
 
-    def format(self, formatting: str, doc: Document = Document()):
+    def __reduce__(self) -> tuple[Any, tuple[Any, ...]]:
+        # pickle only the plain field values and restore without running
+        # __init__, so that no configuration has to be read when unpickling
+        return (
+            Annotation._restore,
+            (
+                self.file,
+                self._color,
+                self.content,
+                self.note,
+                self.page,
+                self.tag,
+                self.type,
+                self._minimum_similarity_color,
+                self.id,
+                self.modified,
+            ),
+        )
+
+    def format(self, formatting: str | Template, doc: Document = Document()):
         """Return a formatted string of the annotation.
 
         Given a provided formatting pattern, this method returns the annotation
         formatted with the correct marker replacements and removals, ready
-        for display or writing.
+        for display or writing. The pattern can either be a mustache template
+        string or a template compiled with :func:`compile_template`.
         """
+        import chevron
+
+        if isinstance(formatting, str):
+            formatting = compile_template(formatting)
         data = {
             "file": self.file,
             "quote": self.content,
@@ -76,8 +147,26 @@ class Annotation:
 
     @color.setter
     def color(self, value: tuple[float, float, float]):
-        self._color = value
-        self.tag = self._tag_from_colorname(self.colorname or "")
+        self._color = _shared_color(value)
+        self._tag = None
+
+    @property
+    def tag(self) -> str:
+        if self._tag is None:
+            self._tag = self._palette().tag(self._color)
+        return self._tag
+
+    @tag.setter
+    def tag(self, value: str):
+        self._tag = value
+
+    @property
+    def minimum_similarity_color(self) -> float:
+        return self._palette().minimum_similarity
+
+    @minimum_similarity_color.setter
+    def minimum_similarity_color(self, value: float | None):
+        self._minimum_similarity_color = value
 
     @property
     def colorname(self):
@@ -86,61 +175,57 @@ class Annotation:
         Finds the closest named color to the annotation and returns it,
         using euclidian distance between the two color vectors.
         """
-        annot_colors = self.color or (0.0, 0.0, 0.0)
-        nearest = None
-        minimum_similarity = self.minimum_similarity_color
-        for name, values in COLORS.items():
-            similarity_ratio = self._color_similarity_ratio(values, annot_colors)
-            if similarity_ratio >= minimum_similarity:
-                minimum_similarity = similarity_ratio
-                nearest = name
-        return nearest
-
-    def _color_similarity_ratio(
-        self,
-        color_one: tuple[float, float, float],
-        color_two: tuple[float, float, float],
-    ) -> float:
-        """Return the similarity of two colors between 0 and 1.
-
-        Takes two rgb color tuples made of floats between 0 and 1,
-        e.g. (1, 0.65, 0) for orange, and returns the similarity
-        between them, with 1 being the same color and 0 being the
-        difference between full black and full white, as a float.
-        """
-        return 1 - (abs(math.dist([*color_one], [*color_two])) / 3)
-
-    def _tag_from_colorname(self, colorname: str) -> str:
-        color_mapping: dict[str, str] = self._getdict("tags", "plugins.extract")
-        if not color_mapping:
-            return ""
+        return self._palette().colorname(self.color or (0.0, 0.0, 0.0))
 
-        return color_mapping.get(colorname, "")
+    @classmethod
+    def _restore(
+        cls,
+        file: str,
+        color: tuple[float, float, float],
+        content: str,
+        note: str,
+        page: int,
+        tag: str,
+        type: str,
+        minimum_similarity_color: float | None,
+        id: str = "",
+        modified: float = 0.0,
+    ) -> "Annotation":
+        """Recreate a pickled annotation without re-computing any of its fields."""
+        annotation = cls.__new__(cls)
+        annotation.file = sys.intern(file)
+        annotation._color = _shared_color(color)
+        annotation.content = content
+        annotation.note = note
+        annotation.page = page
+        annotation._tag = tag
+        annotation.type = type
+        annotation._minimum_similarity_color = minimum_similarity_color
+        annotation.id = id
+        annotation.modified = modified
+        return annotation
 
-    # mimics the functions in papis.config.{getlist,getint,getfloat} etc.
-    def _getdict(self, key: str, section: str | None = None) -> dict[str, str]:
-        """Dict getter
+    @classmethod
+    def tag_annotations(cls, annotations: Iterable["Annotation"]) -> None:
+        """Derive the tags of all untagged annotations from their colors at once.
 
-        :returns: A python dict
-        :raises SyntaxError: Whenever the parsed syntax is either not a valid
-            python object or a valid python dict.
+        Classifies the distinct colors of all annotations in a single batch
+        instead of one annotation at a time, only reading the palette from the
+        configuration once.
         """
-        rawvalue: Any = papis.config.general_get(key, section=section)
-        if isinstance(rawvalue, dict):
-            return cast("dict[str, str]", rawvalue)
-        try:
-            rawvalue = eval(rawvalue)
-        except Exception:
-            raise SyntaxError(
-                f"The configuration key '{key}' must be a valid Python dict: {rawvalue}"
-            )
-        else:
-            if not isinstance(rawvalue, dict):
-                raise SyntaxError(
-                    f"The configuration key '{key}' must be a valid Python dict. Got: {rawvalue} (type {type(rawvalue).__name__})"
-                )
-
-            return cast("dict[str, str]", rawvalue)
+        untagged = [a for a in annotations if a._tag is None]
+        by_palette: dict[float | None, list[Annotation]] = {}
+        for a in untagged:
+            by_palette.setdefault(a._minimum_similarity_color, []).append(a)
+
+        for minimum_similarity, annots in by_palette.items():
+            palette = colors.get_palette(minimum_similarity)
+            names = palette.classify([a.color for a in annots])
+            for a, name in zip(annots, names):
+                a._tag = palette.tags.get(name or "", "")
+
+    def _palette(self) -> colors.Palette:
+        return colors.get_palette(self._minimum_similarity_color)
 
     def __str__(self) -> str:
         return f"Annotation({self.type}: '{self.file}', color: {self.color}, tag: '{self.tag}', page: {self.page}, content: '{self.content}', note: '{self.note}', minimum_similarity_color: {self.minimum_similarity_color})"
@@ -0,0 +1,169 @@
+import contextlib
+import hashlib
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import papis.config
+import papis.logging
+import papis.utils
+
+from papis_extract.annotation import Annotation
+
+logger = papis.logging.get_logger(__name__)
+
+# bump whenever the pickled annotation layout changes
+CACHE_VERSION = 2
+# settings which change the outcome of an extraction
+RELEVANT_SETTINGS = [
+    "tags",
+    "colors",
+    "minimum_similarity_content",
+    "minimum_similarity_color",
+]
+
+
+def default_folder() -> Path:
+    return Path(papis.utils.get_cache_home()) / "extract"
+
+
+def current_settings() -> str:
+    """Return a fingerprint of all extraction-relevant plugin settings."""
+    values = [
+        str(papis.config.get(key, section="plugins.extract"))
+        for key in RELEVANT_SETTINGS
+    ]
+    return hashlib.sha256("\0".join(values).encode()).hexdigest()
+
+
+@dataclass
+class FileIdentity:
+    size: int
+    mtime: int
+    digest: str | None = None
+
+    @classmethod
+    def of(cls, filename: Path, with_digest: bool = False) -> "FileIdentity":
+        stat = filename.stat()
+        return cls(
+            stat.st_size,
+            stat.st_mtime_ns,
+            _file_digest(filename) if with_digest else None,
+        )
+
+
+@dataclass
+class ExtractionCache:
+    """Persistent on-disk cache of extracted annotations.
+
+    Stores the annotations extracted from a file per extractor, keyed by the
+    path of the file. An entry is only valid as long as the size and
+    modification time of the file, as well as the extraction-relevant
+    plugin settings, stay the same. If `hash_content` is set, a file whose
+    modification time changed but whose content did not is still a hit.
+
+    Every entry lives in its own file so that multiple extraction
+    processes can safely read and write the cache at the same time.
+    """
+
+    folder: Path = field(default_factory=default_folder)
+    settings: str = field(default_factory=current_settings)
+    max_size: int = 100 * 1024 * 1024
+    hash_content: bool = False
+    refresh: bool = False
+
+    def get(self, extractor: str, filename: Path) -> list[Annotation] | None:
+        """Return the cached annotations for a file, or None if not cached."""
+        if self.refresh:
+            return None
+        entry_path = self._entry_path(extractor, filename)
+        try:
+            with entry_path.open("rb") as fr:
+                entry: dict[str, Any] = pickle.load(fr)
+            identity = FileIdentity.of(filename)
+        except (
+            OSError,
+            EOFError,
+            pickle.UnpicklingError,
+            # stale entries of a changed annotation layout
+            AttributeError,
+            ImportError,
+            TypeError,
+        ):
+            return None
+
+        if entry.get("version") != CACHE_VERSION:
+            return None
+        if entry.get("settings") != self.settings:
+            return None
+
+        cached: FileIdentity = entry["identity"]
+        if (cached.size, cached.mtime) != (identity.size, identity.mtime):
+            if not self.hash_content or cached.size != identity.size:
+                return None
+            if cached.digest != _file_digest(filename):
+                return None
+            # same content, only the timestamp moved: remember the new one
+            self.put(extractor, filename, entry["annotations"])
+
+        # bump entry for least-recently-used eviction
+        with contextlib.suppress(OSError):
+            os.utime(entry_path)
+        logger.debug(f"Using cached annotations for {filename}.")
+        return entry["annotations"]
+
+    def put(
+        self, extractor: str, filename: Path, annotations: list[Annotation]
+    ) -> None:
+        """Store the annotations extracted from a file."""
+        try:
+            entry = {
+                "version": CACHE_VERSION,
+                "settings": self.settings,
+                "identity": FileIdentity.of(filename, with_digest=self.hash_content),
+                "annotations": annotations,
+            }
+            self.folder.mkdir(parents=True, exist_ok=True)
+            # write to temporary file first so readers never see partial entries
+            with tempfile.NamedTemporaryFile(
+                "wb", dir=self.folder, suffix=".tmp", delete=False
+            ) as fw:
+                pickle.dump(entry, fw, protocol=pickle.HIGHEST_PROTOCOL)
+            Path(fw.name).replace(self._entry_path(extractor, filename))
+        except OSError as e:
+            logger.warning(f"Could not write extraction cache for {filename}: {e}")
+
+    def evict(self) -> None:
+        """Remove least recently used entries until cache is within its size."""
+        try:
+            entries = [(p, p.stat()) for p in self.folder.glob("*.pickle")]
+        except OSError:
+            return
+        total = sum(stat.st_size for _, stat in entries)
+        if total <= self.max_size:
+            return
+
+        entries.sort(key=lambda entry: entry[1].st_mtime)
+        removed = 0
+        for path, stat in entries:
+            if total <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+            removed += 1
+        logger.debug(f"Evicted {removed} entries from the extraction cache.")
+
+    def _entry_path(self, extractor: str, filename: Path) -> Path:
+        key = f"{extractor}\0{filename.resolve()}"
+        return self.folder / f"{hashlib.sha256(key.encode()).hexdigest()}.pickle"
+
+
+def _file_digest(filename: Path) -> str:
+    digest = hashlib.sha256()
+    with filename.open("rb") as fr:
+        for chunk in iter(lambda: fr.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,129 @@
+import io
+import mimetypes
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from types import ModuleType
+from typing import TextIO
+
+import papis.logging
+
+logger = papis.logging.get_logger(__name__)
+
+HEAD_SIZE = 8192
+TAIL_SIZE = 512
+TEXTCHARS = bytearray({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+
+HTML_MIMETYPES = ["text/html", "application/xhtml+xml"]
+
+
+@dataclass(frozen=True)
+class FileInfo:
+    """The result of sniffing a file once.
+
+    Contains the file type as well as the first and last few bytes of
+    the file, so that extractors can run their own detection heuristics
+    without having to open the file again.
+    `kind` is one of 'pdf', 'html', 'text' or 'binary'.
+    """
+
+    path: Path
+    size: int
+    mimetype: str | None
+    kind: str
+    head: bytes
+    tail: bytes
+
+    @property
+    def complete(self) -> bool:
+        """Whether the head contains the complete file content."""
+        return len(self.head) >= self.size
+
+    def head_text(self) -> str:
+        """Return the head decoded like a file opened for reading text.
+
+        Undecodable bytes (e.g. a multi-byte character cut off at the
+        end of the head) are replaced.
+        """
+        with io.TextIOWrapper(io.BytesIO(self.head), errors="replace") as fr:
+            return fr.read()
+
+    def tail_text(self) -> str:
+        """Return the tail decoded like a file opened for reading text."""
+        with io.TextIOWrapper(io.BytesIO(self.tail), errors="replace") as fr:
+            return fr.read()
+
+    def open_text(self) -> TextIO:
+        """Open the file for reading text.
+
+        Re-uses the already read content instead of opening the file
+        again if the head contains all of it.
+        """
+        if self.complete:
+            return io.TextIOWrapper(io.BytesIO(self.head))
+        return self.path.open("r")
+
+
+def classify(filename: Path) -> FileInfo:
+    """Sniff a file to find out what kind of file it is.
+
+    Reads at most the first :data:`HEAD_SIZE` and the last :data:`TAIL_SIZE`
+    bytes of the file. Results are remembered for as long as the file does
+    not change, so multiple extractors asking for the same file only
+    cause a single read.
+
+    :raises OSError: If the file can not be read.
+    """
+    stat = filename.stat()
+    return _classify(filename, stat.st_size, stat.st_mtime_ns)
+
+
+def clear_cache() -> None:
+    """Forget all files classified so far."""
+    _classify.cache_clear()
+
+
+@lru_cache(maxsize=128)
+def _classify(filename: Path, size: int, mtime: int) -> FileInfo:
+    with filename.open("rb") as fr:
+        head = fr.read(HEAD_SIZE)
+        tail = head[-TAIL_SIZE:]
+        if size > HEAD_SIZE:
+            fr.seek(size - TAIL_SIZE)
+            tail = fr.read(TAIL_SIZE)
+
+    mimetype = _mimetype(filename, head)
+    kind = "binary"
+    if head.startswith(b"%PDF-") or mimetype == "application/pdf":
+        kind = "pdf"
+    elif mimetype in HTML_MIMETYPES:
+        kind = "html"
+    elif not head.translate(None, TEXTCHARS):
+        kind = "text"
+
+    logger.debug(f"Classified {filename} as {kind} ({mimetype}).")
+    return FileInfo(filename, size, mimetype, kind, head, tail)
+
+
+def _mimetype(filename: Path, head: bytes) -> str | None:
+    """Guess the mime type from the extension, falling back to libmagic."""
+    guessed = mimetypes.guess_type(filename)[0]
+    if guessed:
+        return guessed
+    magic = _magic()
+    if magic is None:
+        return None
+    try:
+        return magic.from_buffer(head, mime=True)
+    except magic.MagicException:
+        return None
+
+
+@lru_cache(maxsize=1)
+def _magic() -> ModuleType | None:
+    """Import libmagic only once it is needed, if it is available at all."""
+    try:
+        import magic
+    except ImportError:  # python-magic raises if libmagic is not installed
+        return None
+    return magic
@@ -0,0 +1,173 @@
+import math
+from collections.abc import Sequence
+from importlib.util import find_spec
+from typing import Any
+
+import papis.config
+import papis.logging
+
+from papis_extract import config
+
+HAS_NUMPY = find_spec("numpy") is not None
+
+logger = papis.logging.get_logger(__name__)
+
+Color = tuple[float, float, float]
+
+COLOR_SIMILARITY_MINIMUM_FALLBACK = 0.833
+
+COLORS: dict[str, Color] = {
+    "blue": (0, 0, 1),
+    "green": (0, 1, 0),
+    "red": (1, 0, 0),
+    "cyan": (0, 1, 1),
+    "yellow": (1, 1, 0),
+    "magenta": (1, 0, 1),
+    "purple": (0.5, 0, 0.5),
+    "pink": (1, 0.75, 0.8),
+    "orange": (1, 0.65, 0),
+}
+
+
+def similarity_ratio(color_one: Color, color_two: Color) -> float:
+    """Return the similarity of two colors between 0 and 1.
+
+    Takes two rgb color tuples made of floats between 0 and 1,
+    e.g. (1, 0.65, 0) for orange, and returns the similarity
+    between them, with 1 being the same color and 0 being the
+    difference between full black and full white, as a float.
+    """
+    return 1 - (abs(math.dist([*color_one], [*color_two])) / 3)
+
+
+class Palette:
+    """Named colors and the tags belonging to them.
+
+    Finds the closest named color for any annotation color. Since readers
+    only ever highlight with a handful of distinct colors, every color is
+    only classified once and then remembered.
+    """
+
+    def __init__(
+        self,
+        colors: dict[str, Color],
+        tags: dict[str, str],
+        minimum_similarity: float = COLOR_SIMILARITY_MINIMUM_FALLBACK,
+    ) -> None:
+        self.colors = colors
+        self.tags = tags
+        self.minimum_similarity = minimum_similarity
+        self._names: dict[Color, str | None] = {}
+
+    def colorname(self, color: Color) -> str | None:
+        """Return the name of the closest color in the palette.
+
+        Returns None if no color is at least as similar as the minimum
+        similarity of the palette.
+        """
+        try:
+            return self._names[color]
+        except KeyError:
+            return self.classify([color])[0]
+
+    def tag(self, color: Color) -> str:
+        """Return the tag belonging to a color, or an empty string."""
+        return self.tags.get(self.colorname(color) or "", "")
+
+    def classify(self, colors: Sequence[Color]) -> list[str | None]:
+        """Return the closest color names for many colors at once.
+
+        Only colors which were not classified before are compared against
+        the palette, all of them at once if NumPy is available.
+        """
+        unknown = [c for c in dict.fromkeys(colors) if c not in self._names]
+        if unknown:
+            nearest = (
+                self._nearest_vectorized(unknown)
+                if HAS_NUMPY
+                else [self._nearest(c) for c in unknown]
+            )
+            self._names.update(zip(unknown, nearest))
+        return [self._names[c] for c in colors]
+
+    def _nearest(self, color: Color) -> str | None:
+        nearest = None
+        minimum_similarity = self.minimum_similarity
+        for name, values in self.colors.items():
+            ratio = similarity_ratio(values, color)
+            if ratio >= minimum_similarity:
+                minimum_similarity = ratio
+                nearest = name
+        return nearest
+
+    def _nearest_vectorized(self, colors: list[Color]) -> list[str | None]:
+        import numpy as np
+
+        if not self.colors:
+            return [None] * len(colors)
+        names = list(self.colors)
+        palette = np.array(list(self.colors.values()), dtype=float)
+        distances = np.linalg.norm(
+            np.array(colors, dtype=float)[:, None, :] - palette[None, :, :], axis=2
+        )
+        ratios = 1 - distances / 3
+        # like the loop in _nearest, the last of equally close colors wins
+        last_best = len(names) - 1 - np.argmax(ratios[:, ::-1], axis=1)
+        best = ratios[np.arange(len(colors)), last_best]
+        return [
+            names[i] if ratio >= self.minimum_similarity else None
+            for i, ratio in zip(last_best.tolist(), best.tolist())
+        ]
+
+
+_palettes: dict[tuple[str, ...], Palette] = {}
+
+
+def get_palette(minimum_similarity: float | None = None) -> Palette:
+    """Return the palette set up in the plugin configuration.
+
+    The palette consists of the default :data:`COLORS`, any colors added with
+    the 'colors' option and the tags of the 'tags' option. A tag can also
+    directly be given an rgb color instead of a color name, e.g.
+    `{"important": (1.0, 0.0, 0.0)}`.
+
+    Configuration values are only parsed again if they changed, so that
+    the same palette (including its already classified colors) is re-used.
+    """
+    raw: list[Any] = [
+        papis.config.general_get(key, section="plugins.extract")
+        for key in ["tags", "colors", "minimum_similarity_color"]
+    ]
+    key = (*map(str, raw), str(minimum_similarity))
+    if key not in _palettes:
+        _palettes[key] = _parse_palette(minimum_similarity)
+    return _palettes[key]
+
+
+def _parse_palette(minimum_similarity: float | None) -> Palette:
+    colors: dict[str, Color] = dict(COLORS)
+    tags: dict[str, str] = {}
+    try:
+        for name, value in config.getdict("colors", "plugins.extract").items():
+            colors[name] = _to_color(value)
+        for name, value in config.getdict("tags", "plugins.extract").items():
+            if isinstance(value, str):
+                tags[name] = value
+            else:
+                colors[name] = _to_color(value)
+                tags[name] = name
+    except (SyntaxError, TypeError, ValueError) as e:
+        logger.error(f"Invalid color or tag configuration: {e}")
+
+    return Palette(
+        colors,
+        tags,
+        minimum_similarity
+        or papis.config.getfloat("minimum_similarity_color", "plugins.extract")
+        or COLOR_SIMILARITY_MINIMUM_FALLBACK,
+    )
+
+
+def _to_color(value: Any) -> Color:
+    r, g, b = (float(v) for v in value)
+    return (r, g, b)
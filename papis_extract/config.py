@@ -0,0 +1,29 @@
+from typing import Any, cast
+
+import papis.config
+
+
+# mimics the functions in papis.config.{getlist,getint,getfloat} etc.
+def getdict(key: str, section: str | None = None) -> dict[str, Any]:
+    """Dict getter
+
+    :returns: A python dict
+    :raises SyntaxError: Whenever the parsed syntax is either not a valid
+        python object or a valid python dict.
+    """
+    rawvalue: Any = papis.config.general_get(key, section=section)
+    if isinstance(rawvalue, dict):
+        return cast("dict[str, Any]", rawvalue)
+    try:
+        rawvalue = eval(rawvalue)
+    except Exception:
+        raise SyntaxError(
+            f"The configuration key '{key}' must be a valid Python dict: {rawvalue}"
+        )
+    else:
+        if not isinstance(rawvalue, dict):
+            raise SyntaxError(
+                f"The configuration key '{key}' must be a valid Python dict. Got: {rawvalue} (type {type(rawvalue).__name__})"
+            )
+
+        return cast("dict[str, Any]", rawvalue)
@@ -5,4 +5,18 @@ class ExtractionError(Exception):
     run routine itself.
     """
 
-    pass
+
+class ExtractionAborted(ExtractionError):
+    """Raised if an isolated extraction was aborted.
+
+    The extraction of a file ran out of its time or memory budget,
+    or crashed the process it was running in.
+    """
+
+
+class ExportError(Exception):
+    """Raised for exceptions during export.
+
+    Some annotations could not be written by the exporter, e.g. since
+    the notes of a document could not be read or written.
+    """
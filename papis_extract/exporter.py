@@ -1,3 +1,4 @@
+from collections.abc import Iterable
 from dataclasses import dataclass
 from typing import Protocol
 
@@ -5,18 +6,20 @@ import papis.document
 import papis.logging
 
 from papis_extract.annotation import Annotation
-from papis_extract.formatter import Formatter
+from papis_extract.formatter import BlockFormatter, Formatter
 
 logger = papis.logging.get_logger(__name__)
 
 
 @dataclass
 class Exporter(Protocol):
-    formatter: Formatter
+    formatter: Formatter | BlockFormatter
     edit: bool = False
     git: bool = False
     duplicates: bool = False
+    overwrite: bool = False
 
     def run(
-        self, annot_docs: list[tuple[papis.document.Document, list[Annotation]]]
+        self,
+        annot_docs: Iterable[tuple[papis.document.Document, list[Annotation]]],
     ) -> None: ...
@@ -1,12 +1,14 @@
 import papis.logging
 
 from papis_extract.exporter import Exporter
-from papis_extract.exporters.notes import NotesExporter
-from papis_extract.exporters.stdout import StdoutExporter
+from papis_extract.registry import LazyRegistry, lazy
 
 logger = papis.logging.get_logger(__name__)
 
-all_exporters: dict[str, type[Exporter]] = {}
+# exporters are only imported when first used, see all_extractors
+all_exporters: LazyRegistry[type[Exporter]] = LazyRegistry()
 
-all_exporters["stdout"] = StdoutExporter
-all_exporters["notes"] = NotesExporter
+all_exporters.register(
+    "stdout", lazy("papis_extract.exporters.stdout", "StdoutExporter")
+)
+all_exporters.register("notes", lazy("papis_extract.exporters.notes", "NotesExporter"))
@@ -1,73 +1,188 @@
-from dataclasses import dataclass
+import re
+import shutil
+import subprocess
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
 
-import Levenshtein
 import papis.commands.edit
 import papis.config
 import papis.document
-import papis.git
 import papis.notes
 from papis.document import Document
 from papis.logging import get_logger
 
+from papis_extract import profiling
 from papis_extract.annotation import Annotation
-from papis_extract.formatter import Formatter
+from papis_extract.exceptions import ExportError
+from papis_extract.formatter import BlockFormatter, Formatter, formatted_blocks
+from papis_extract.ledger import Ledger
+from papis_extract.similarity import SimilarityIndex
+from papis_extract.writer import BackgroundWriter
 
 logger = get_logger(__name__)
 
+# amount of files staged with a single git invocation
+GIT_ADD_CHUNK_SIZE = 500
+
 
 @dataclass
 class NotesExporter:
-    formatter: Formatter
+    formatter: Formatter | BlockFormatter
     edit: bool = False
     git: bool = False
     duplicates: bool = False
+    overwrite: bool = False
+    # notes written in the background at once, taken from the config if unset
+    write_jobs: int | None = None
 
-    def run(self, annot_docs: list[tuple[Document, list[Annotation]]]) -> None:
+    def run(self, annot_docs: Iterable[tuple[Document, list[Annotation]]]) -> None:
         """Write annotations into document notes.
 
         Permanently writes the given annotations into notes
         belonging to papis documents. Creates new notes for
         documents missing a note field or appends to existing.
+
+        Annotations already written to a note in an earlier run are
+        remembered in a ledger next to the note and skipped right away;
+        only the remaining ones are compared with the note contents.
+
+        Notes are written on background threads while the next documents
+        are still extracted, with writes to the same note kept in order.
+        Documents whose notes could not be written are reported once all
+        others are done, raising an :class:`ExportError`.
+
+        If git is enabled, all changed files are committed together
+        once every document has been written.
         """
-        for doc, annots in annot_docs:
+        commits = GitBatch(
+            papis.config.getint("git_batch_size", "plugins.extract") or 0
+        )
+        # notes have to be written before they can be opened for editing
+        jobs = self.write_jobs
+        if self.edit:
+            jobs = 0
+        elif jobs is None:
+            jobs = papis.config.getint("write_jobs", "plugins.extract")
+        writer: BackgroundWriter[tuple[Document, list[Path]]] = BackgroundWriter(
+            jobs or 0
+        )
+        try:
+            for doc, annots in annot_docs:
+                if not annots:
+                    continue
+                # resolve the note on this thread, since it may save the document
+                note = papis.notes.notes_path(doc)
+                written = writer.submit(
+                    note, partial(self._write_document_returning, doc, annots)
+                )
+                self._add_to_commits(commits, written)
+
+                if self.edit:
+                    papis.commands.edit.edit_notes(doc, git=self.git)
+        finally:
+            self._add_to_commits(commits, writer.flush())
+            if self.git:
+                with profiling.timed("git"):
+                    commits.commit()
+
+        for note, error in writer.errors:
+            logger.error(f"Could not write annotations to {note}: {error}")
+        if writer.errors:
+            raise ExportError(
+                f"Could not write annotations of {len(writer.errors)} documents."
+            )
+
+    def _write_document_returning(
+        self, doc: Document, annots: list[Annotation]
+    ) -> tuple[Document, list[Path]]:
+        return doc, self._write_document(doc, annots)
+
+    def _add_to_commits(
+        self, commits: "GitBatch", written: list[tuple[Document, list[Path]]]
+    ) -> None:
+        if not self.git:
+            return
+        for doc, changed in written:
+            if changed:
+                commits.add(doc, changed)
+
+    def _write_document(self, doc: Document, annots: list[Annotation]) -> list[Path]:
+        """Write the annotations of a single document into its note.
+
+        Returns all files which were changed in the process.
+        """
+        changed: list[Path] = []
+        ledger = self._ledger(doc)
+        new_annots = annots
+        if ledger is not None and not self.duplicates:
+            with profiling.timed("ledger", doc):
+                new_annots = ledger.unexported(annots)
+            if len(new_annots) < len(annots):
+                logger.debug(
+                    f"Skipping {len(annots) - len(new_annots)} already "
+                    f"exported annotations of {papis.document.describe(doc)}."
+                )
+
+        if new_annots:
             # first always true since we write single doc per note
-            formatted_annotations: list[str] = self.formatter(
-                doc, annots, first=True
-            ).split("\n")
-            if formatted_annotations:
-                self._add_annots_to_note(
-                    doc, formatted_annotations, duplicates=self.duplicates
+            with profiling.timed("format", doc):
+                blocks = list(
+                    formatted_blocks(self.formatter, doc, new_annots, first=True)
                 )
+            if self.overwrite and not self.duplicates:
+                notes_path = self._overwrite_annots_in_note(doc, blocks)
+            else:
+                notes_path = self._add_annots_to_note(
+                    doc, blocks, duplicates=self.duplicates
+                )
+            if notes_path:
+                changed += [notes_path, Path(doc.get_info_file())]
+
+        if annots:
+            # remember all annotations, also those dropped as duplicates,
+            # since they are already contained in the note
+            ledger = ledger or Ledger(Path(papis.notes.notes_path(doc)))
+            with profiling.timed("ledger", doc):
+                ledger.record(annots)
+                saved = ledger.save()
+            if saved:
+                changed.append(ledger.path)
+
+        return changed
 
-            if self.edit:
-                papis.commands.edit.edit_notes(doc, git=self.git)
+    def _ledger(self, document: Document) -> Ledger | None:
+        """Return the ledger of exported annotations for the document note.
+
+        Returns None if the document has no note yet, without creating one.
+        """
+        if not papis.notes.has_notes(document):
+            return None
+        return Ledger(Path(papis.notes.notes_path(document)))
 
     def _add_annots_to_note(
         self,
         document: Document,
         formatted_annotations: list[str],
-        git: bool = False,
         duplicates: bool = False,
-    ) -> None:
+    ) -> Path | None:
         """
         Append new annotations to the end of a note.
 
         This function appends new annotations to the end of a note file. It takes in a
-        document object containing the note, a list of formatted annotations to be
-        added, and optional flags git and duplicates. If git is True, the changes will be
-        committed to git. If duplicates is True, the annotations will be added even if they
-        already exist in the note.
+        document object containing the note, a list of formatted annotation blocks to
+        be added, and an optional flag duplicates. If duplicates is True, the
+        annotations will be added even if they already exist in the note.
 
         :param document: The document object representing the note
         :type document: class:`papis.document.Document`
-        :param formatted_annotations: A list of already formatted annotations to be added
+        :param formatted_annotations: A list of already formatted blocks to be added
         :type formatted_annotations: list[str]
-        :param git: Flag indicating whether to commit changes to git, defaults to False.
-        :type git: bool, optional
         :param duplicates:  Flag indicating whether to force adding annotations as duplicates
             even if they already exist, defaults to False.
         :type duplicates: bool, optional
+        :returns: The path of the note if anything was written to it, otherwise None.
         """
         logger.debug("Adding annotations to note...")
         notes_path = Path(papis.notes.notes_path_ensured(document))
@@ -78,64 +193,274 @@ class NotesExporter:
 
         new_annotations: list[str] = formatted_annotations
         if not duplicates:
-            new_annotations = self._drop_existing_annotations(
-                formatted_annotations, existing
-            )
+            with profiling.timed("dedupe", document):
+                new_annotations = self._drop_existing_annotations(
+                    formatted_annotations, existing
+                )
         if not new_annotations:
             logger.debug("No new annotations to be added.")
-            return
+            return None
 
-        with notes_path.open("a") as fa:
+        with profiling.timed("write", document), notes_path.open("a") as fa:
             # add newline if theres no empty space at file end
             if len(existing) > 0 and existing[-1].strip() != "":
                 fa.write("\n")
-            # We filter out any empty lines from the annotations
-            filtered_annotations = [annot for annot in new_annotations if annot != ""]
-            fa.write("\n\n".join(filtered_annotations))
+            fa.write("\n\n".join(block.rstrip("\n") for block in new_annotations))
             logger.info(
-                f"Wrote {len(filtered_annotations)} "
-                f"{'line' if len(filtered_annotations) == 1 else 'lines'} "
+                f"Wrote {len(new_annotations)} "
+                f"{'block' if len(new_annotations) == 1 else 'blocks'} "
                 f"to {papis.document.describe(document)}"
             )
+        return notes_path
 
-        if git:
-            msg = f"Update annotations for '{papis.document.describe(document)}'"
-            folder = document.get_main_folder()
-            if folder:
-                papis.git.add_and_commit_resources(
-                    folder, [str(notes_path), document.get_info_file()], msg
-                )
+    def _overwrite_annots_in_note(
+        self, document: Document, formatted: list[str]
+    ) -> Path | None:
+        """Replace changed annotations in a note and append new ones.
+
+        The note is split into blocks separated by empty lines. Every formatted
+        block replaces the existing block whose first line is similar enough,
+        other blocks of the note are left untouched,
+        and blocks without any similar counterpart are appended to the end.
+        The note is rewritten at once by replacing it with a temporary file.
+
+        Returns the path of the note if it changed, otherwise None.
+        """
+        notes_path = Path(papis.notes.notes_path_ensured(document))
+        parts = _split_blocks(notes_path.read_text())
+        minimum_similarity = (
+            papis.config.getfloat("minimum_similarity", "plugins.extract") or 1.0
+        )
+        with profiling.timed("dedupe", document):
+            replaced, appended = _merge_blocks(
+                parts,
+                formatted,
+                minimum_similarity,
+            )
+        if not replaced and not appended:
+            logger.debug("No new or changed annotations to be written.")
+            return None
+
+        text = "".join(parts).rstrip("\n")
+        if appended:
+            text = "\n\n".join([text, *appended] if text.strip() else appended)
+        with profiling.timed("write", document):
+            _write_atomically(notes_path, text + "\n")
+        logger.info(
+            f"Replaced {replaced} and added {len(appended)} "
+            f"{'block' if len(appended) == 1 else 'blocks'} "
+            f"in {papis.document.describe(document)}"
+        )
+        return notes_path
 
     def _drop_existing_annotations(
         self, formatted_annotations: list[str], file_lines: list[str]
     ) -> list[str]:
         """Returns the input annotations dropping any existing.
 
-        Takes a list of formatted annotations and a list of strings
-        (most probably existing lines in a file). If any annotations
-        match an existing line closely enough, they will be dropped.
+        Takes a list of formatted annotation blocks and a list of strings
+        (most probably existing lines in a file). If the line identifying
+        the annotation of a block, see :func:`_block_key`, matches an
+        existing line closely enough, the whole block will be dropped.
 
-        Returns list of annotations without duplicates.
+        Returns list of annotation blocks without duplicates.
         """
         minimum_similarity = (
             papis.config.getfloat("minimum_similarity", "plugins.extract") or 1.0
         )
 
+        index = SimilarityIndex(line.strip() for line in file_lines if line.strip())
         remaining: list[str] = []
-        for an in formatted_annotations:
-            an_split = an.splitlines()
-            if an_split and not self._test_similarity(
-                an_split[0], file_lines, minimum_similarity
-            ):
-                remaining.append(an)
+        for block in formatted_annotations:
+            key = _block_key(block)
+            if block.strip() and index.find(key, minimum_similarity) is None:
+                remaining.append(block)
 
         return remaining
 
-    def _test_similarity(
-        self, string: str, lines: list[str], minimum_similarity: float = 1.0
-    ) -> bool:
-        for line in lines:
-            ratio = Levenshtein.ratio(string, line)
-            if ratio > minimum_similarity:
-                return True
-        return False
+
+_block_separator = re.compile(r"(\n[ \t]*\n(?:[ \t]*\n)*)")
+# a tag line of an annotation like '#important', unlike a '# Heading'
+_tag_line = re.compile(r"#[^\s#]")
+
+
+def _split_blocks(text: str) -> list[str]:
+    """Split text into blocks separated by empty lines.
+
+    Returns the blocks at even and their separators at odd positions,
+    so that joining all parts results in the original text.
+    """
+    return _block_separator.split(text)
+
+
+def _block_key(block: str) -> str:
+    """Return the line identifying the annotation of a block.
+
+    Skips leading tag lines, since many annotations share the same tag,
+    so that an annotation is recognized by its quote (or its note if it
+    has no quote). Returns an empty string for blocks of only tags.
+    """
+    for line in block.split("\n"):
+        line = line.strip()
+        if line and not _tag_line.match(line):
+            return line
+    return ""
+
+
+def _annotation_parts(parts: list[str], i: int, lines: set[str]) -> tuple[int, int]:
+    """Return the first and last index of the parts making up an annotation.
+
+    Notes written without overwriting hold every line of an annotation as a
+    block of its own, so the annotation of the block at `i` also spans the
+    blocks of only tags directly before it, and the indented blocks (like
+    the notes of the markdown formatters) or blocks equal to any of the
+    `lines` directly after it.
+    """
+    start = i
+    if not _tag_line.match(parts[i].strip()):
+        while (
+            start >= 2 and parts[start - 2].strip() and not _block_key(parts[start - 2])
+        ):
+            start -= 2
+    end = i
+    while (
+        end + 2 < len(parts)
+        and parts[end + 2].strip()
+        and (parts[end + 2][:1] in (" ", "\t") or parts[end + 2].strip() in lines)
+    ):
+        end += 2
+    return start, end
+
+
+def _merge_blocks(
+    parts: list[str], new_blocks: list[str], minimum_similarity: float
+) -> tuple[int, list[str]]:
+    """Merge new blocks into the parts of a note in place.
+
+    A new block equal to an existing one is skipped and one identifying the
+    same annotation as an existing block, see :func:`_block_key`, replaces
+    the old annotation together with all blocks belonging to it.
+
+    Returns the amount of replaced blocks and all blocks to be appended.
+    """
+    existing = {part.strip() for part in parts[::2]}
+    positions: dict[str, list[int]] = {}
+    for i in range(0, len(parts), 2):
+        key = _block_key(parts[i])
+        if key:
+            positions.setdefault(key, []).append(i)
+    index = SimilarityIndex(positions)
+
+    replaced = 0
+    appended: list[str] = []
+    for block in new_blocks:
+        block = block.strip()
+        if not block or block in existing:
+            continue
+        match = index.find(_block_key(block), minimum_similarity)
+        candidates = positions.get(match or "", [])
+        # skip blocks which were already removed together with another one
+        while candidates and not parts[candidates[0]].strip():
+            candidates.pop(0)
+        if not candidates:
+            appended.append(block)
+            continue
+
+        i = candidates.pop(0)
+        lines = {line.strip() for line in block.split("\n")[1:] if line.strip()}
+        start, end = _annotation_parts(parts, i, lines)
+        existing.add(block)
+        if "\n".join(parts[j].strip() for j in range(start, end + 1, 2)) == block:
+            continue
+        # keep any whitespace in front of the replaced annotation
+        old = parts[start]
+        parts[start] = old[: len(old) - len(old.lstrip())] + block
+        for j in range(start + 1, end + 1):
+            parts[j] = ""
+        replaced += 1
+    return replaced, appended
+
+
+def _write_atomically(path: Path, text: str) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(text)
+    shutil.copymode(path, tmp)
+    tmp.replace(path)
+
+
+@dataclass
+class GitBatch:
+    """Files changed for documents, to be committed to git together.
+
+    Instead of committing every document on its own, which runs git
+    for every single note, the changes are collected and committed
+    at once for every library folder. A batch size limits the amount
+    of documents per commit, with 0 putting all of them into one.
+    """
+
+    batch_size: int = 0
+    # library folder -> document description -> changed files
+    changes: dict[Path, dict[str, list[Path]]] = field(
+        default_factory=dict[Path, dict[str, list[Path]]]
+    )
+
+    def add(self, document: Document, files: Iterable[Path]) -> None:
+        folder = _library_folder(document)
+        if folder is None:
+            return
+        described = self.changes.setdefault(folder, {})
+        described.setdefault(papis.document.describe(document), []).extend(files)
+
+    def commit(self) -> None:
+        """Commit all collected changes and forget about them."""
+        for folder, described in self.changes.items():
+            docs = list(described.items())
+            size = self.batch_size if self.batch_size > 0 else len(docs)
+            for i in range(0, len(docs), size):
+                self._commit_batch(folder, dict(docs[i : i + size]))
+        self.changes = {}
+
+    def _commit_batch(self, folder: Path, described: dict[str, list[Path]]) -> None:
+        files = list(dict.fromkeys(str(f) for fs in described.values() for f in fs))
+        if len(described) == 1:
+            msg = f"Update annotations for '{next(iter(described))}'"
+        else:
+            msg = f"Update annotations for {len(described)} documents\n\n" + (
+                "\n".join(f"- {desc}" for desc in described)
+            )
+        try:
+            # stage in chunks to stay below command line length limits
+            for i in range(0, len(files), GIT_ADD_CHUNK_SIZE):
+                _git(folder, "add", "--", *files[i : i + GIT_ADD_CHUNK_SIZE])
+            if _git(folder, "diff", "--cached", "--quiet", check=False) == 0:
+                logger.debug(f"No changes to commit in {folder}.")
+                return
+            _git(folder, "commit", "-m", msg)
+        except (OSError, subprocess.CalledProcessError) as e:
+            stderr = getattr(e, "stderr", "") or ""
+            logger.error(f"Could not commit annotations in {folder}: {e} {stderr}")
+            return
+        logger.info(f"[GIT] {msg.splitlines()[0]}")
+
+
+def _git(folder: Path, *args: str, check: bool = True) -> int:
+    return subprocess.run(
+        ["git", *args], cwd=folder, capture_output=True, text=True, check=check
+    ).returncode
+
+
+def _library_folder(document: Document) -> Path | None:
+    """Return the library folder containing the document.
+
+    Falls back to the folder of the document itself if it does not belong
+    to any of the configured libraries.
+    """
+    main_folder = document.get_main_folder()
+    if not main_folder:
+        return None
+    doc_folder = Path(main_folder).resolve()
+    for lib_dir in papis.config.get_lib_dirs():
+        lib_folder = Path(lib_dir).expanduser().resolve()
+        if doc_folder.is_relative_to(lib_folder):
+            return lib_folder
+    return doc_folder
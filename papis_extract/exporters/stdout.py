@@ -1,28 +1,46 @@
+import sys
+from collections.abc import Iterable
 from dataclasses import dataclass
+from typing import TextIO
 
 from papis.document import Document
 
+from papis_extract import profiling
 from papis_extract.annotation import Annotation
-from papis_extract.formatter import Formatter
+from papis_extract.formatter import BlockFormatter, Formatter, formatted_blocks
 
 
 @dataclass
 class StdoutExporter:
-    formatter: Formatter
+    formatter: Formatter | BlockFormatter
     edit: bool = False
     git: bool = False
     duplicates: bool = False
+    overwrite: bool = False
+    output: TextIO | None = None
 
-    def run(self, annot_docs: list[tuple[Document, list[Annotation]]]) -> None:
+    def run(self, annot_docs: Iterable[tuple[Document, list[Annotation]]]) -> None:
         """Pretty print annotations to stdout.
 
         Gives a nice human-readable representations of
         the annotations in somewhat of a list form.
-        Not intended for machine-readability.
+        Not intended for machine-readability, unless a record format
+        like csv or jsonl is used.
+
+        Writes to the given output stream instead if there is one, e.g.
+        an opened output file.
         """
+        stream = self.output or sys.stdout
         first_entry = True
         for doc, annots in annot_docs:
-            output: str = self.formatter(doc, annots, first=first_entry)
-            if output:
-                print("{output}\n".format(output=output.rstrip("\n")))
+            with profiling.timed("format", doc):
+                blocks = list(
+                    formatted_blocks(self.formatter, doc, annots, first=first_entry)
+                )
+            if blocks:
+                with profiling.timed("write", doc):
+                    stream.writelines(blocks)
+                    if stream is sys.stdout:
+                        # so that output appears while extraction continues
+                        stream.flush()
                 first_entry = False
@@ -1,24 +1,54 @@
+import multiprocessing
+import os
+import re
+import sys
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from functools import partial
+from itertools import starmap
 from pathlib import Path
-from typing import Protocol
+from typing import TYPE_CHECKING, Protocol, TypeVar
 
+import papis.document
 import papis.logging
 from papis.document import Document
 
+from papis_extract import classifier, profiling
 from papis_extract.annotation import Annotation
-from papis_extract.exceptions import ExtractionError
+from papis_extract.cache import ExtractionCache
+from papis_extract.exceptions import ExtractionAborted, ExtractionError
+
+if TYPE_CHECKING:
+    from multiprocessing.pool import AsyncResult
+
+    from papis_extract.isolation import Isolation
 
 logger = papis.logging.get_logger(__name__)
 
+T = TypeVar("T")
+
 
 class Extractor(Protocol):
+    # the kinds of files the extractor handles, see papis_extract.classifier
+    file_types: frozenset[str]
+
     def can_process(self, filename: Path) -> bool: ...
 
-    def run(self, filename: Path) -> list[Annotation]: ...
+    def run(self, filename: Path, since: float = 0.0) -> list[Annotation]:
+        """Return the annotations contained in the file.
+
+        Extractors which know when single annotations were last modified
+        may leave out all annotations not changed after the `since`
+        timestamp, any others are filtered out after extraction.
+        """
+        ...
 
 
 def start(
     extractor: Extractor,
     document: Document,
+    cache: ExtractionCache | None = None,
+    isolation: "Isolation | None" = None,
 ) -> list[Annotation] | None:
     """Extract all annotations from passed documents.
 
@@ -26,24 +56,251 @@ def start(
     documents passed in (empty list if no annotations).
     If there are no files that the extractor can process,
     returns None instead.
+
+    If a cache is passed, annotations of files which did not change
+    since their last extraction are taken from it instead.
+
+    If an isolation is passed, every file is extracted in its own process
+    within its time and memory budget, see :class:`Isolation`.
+    """
+    return start_document(document, [extractor], cache=cache, isolation=isolation)
+
+
+def start_document(
+    document: Document,
+    extractors: Sequence[Extractor],
+    cache: ExtractionCache | None = None,
+    since: float = 0.0,
+    isolation: "Isolation | None" = None,
+) -> list[Annotation] | None:
+    """Extract all annotations from a document using all passed extractors.
+
+    Every file of the document is classified once and then only handed to
+    the extractors which handle its kind of file.
+
+    Returns the annotations of all extractors combined (empty list if
+    no annotations), in the order of the extractors passed in. If none
+    of the extractors can process any of the document files, returns
+    None instead.
+
+    If `since` is given, only annotations modified after that timestamp
+    are returned and files not modified since are not extracted at all.
     """
-    annotations: list[Annotation] = []
-    file_available: bool = False
+    table = dispatch_table(extractors)
+    extracted: dict[int, list[Annotation]] = {}
 
     for file in document.get_files():
         fname = Path(file)
-        if not extractor.can_process(fname):
+        try:
+            with profiling.timed("classify", document, fname):
+                info = classifier.classify(fname)
+        except OSError:
+            logger.error(f"File {file} not readable.")
             continue
-        file_available = True
 
-        try:
-            annotations.extend(extractor.run(fname))
-        except ExtractionError as e:
-            logger.error(
-                f"File extraction errors for {file}. File may be damaged.\n{e}"
-            )
+        for i in table.get(info.kind, []):
+            name = type(extractors[i]).__name__
+            with profiling.timed(f"can_process.{name}", document, fname):
+                processable = extractors[i].can_process(fname)
+            if not processable:
+                continue
+            with profiling.timed(f"extract.{name}", document, fname):
+                annotations = _extract_file(
+                    extractors[i], fname, cache, since, isolation
+                )
+            extracted.setdefault(i, []).extend(annotations)
 
-    if not file_available:
+    if not extracted:
         return None
 
-    return annotations
+    return [annot for i in sorted(extracted) for annot in extracted[i]]
+
+
+def dispatch_table(extractors: Sequence[Extractor]) -> dict[str, list[int]]:
+    """Map every kind of file to the extractors which can handle it.
+
+    Returns the positions of the extractors in the passed sequence
+    for each file kind.
+    """
+    table: dict[str, list[int]] = {}
+    for i, ext in enumerate(extractors):
+        for kind in ext.file_types:
+            table.setdefault(kind, []).append(i)
+    return table
+
+
+def _extract_file(
+    extractor: Extractor,
+    filename: Path,
+    cache: ExtractionCache | None,
+    since: float = 0.0,
+    isolation: "Isolation | None" = None,
+) -> list[Annotation]:
+    mtime = filename.stat().st_mtime
+    if since and mtime <= since:
+        logger.debug(f"Skipping {filename}, unchanged since last extraction.")
+        return []
+
+    name = type(extractor).__name__
+    cached = cache.get(name, filename) if cache else None
+    if cached is not None:
+        return _changed_since(cached, since)
+
+    skipped = isolation.skipped.reason(name, filename) if isolation else None
+    if skipped is not None:
+        logger.warning(
+            f"Skipping {filename} until it changes, "
+            f"its extraction {skipped} in an earlier run."
+        )
+        return []
+
+    try:
+        if isolation:
+            extracted = isolation.run(extractor, filename, since=since)
+        else:
+            extracted = extractor.run(filename, since=since)
+    except ExtractionAborted as e:
+        logger.error(f"Skipping {filename}, its extraction {e}.")
+        if isolation:
+            isolation.skipped.add(name, filename, str(e))
+        return []
+    except ExtractionError as e:
+        logger.error(
+            f"File extraction errors for {filename}. File may be damaged.\n{e}"
+        )
+        return []
+
+    # annotations without their own timestamp changed with their file
+    for a in extracted:
+        a.modified = a.modified or mtime
+    Annotation.tag_annotations(extracted)
+    if since:
+        # only some of the annotations were extracted, nothing to cache
+        return _changed_since(extracted, since)
+    if cache:
+        cache.put(name, filename, extracted)
+    return extracted
+
+
+def _changed_since(annotations: list[Annotation], since: float) -> list[Annotation]:
+    if not since:
+        return annotations
+    return [a for a in annotations if a.modified > since]
+
+
+def start_all(
+    documents: Sequence[Document],
+    extractors: list[Extractor],
+    jobs: int = 1,
+    cache: ExtractionCache | None = None,
+    since: Callable[[Document], float] | None = None,
+    isolation: "Isolation | None" = None,
+) -> Iterator[tuple[Document, list[Annotation]]]:
+    """Extract annotations from all passed documents.
+
+    Yields each document together with its annotations as soon as they
+    are extracted, so that they can be exported while the remaining
+    documents are still being worked on.
+
+    Runs the extraction over a pool of `jobs` worker processes if more
+    than one job is requested, otherwise extracts serially. The results
+    are always yielded in the order of the documents passed in.
+
+    If `since` is given, it returns the timestamp for every document after
+    which annotations have to be modified to be extracted.
+
+    If an isolation is passed, every file is additionally extracted in its
+    own process, which is aborted if it runs out of time or memory.
+    """
+    worker = partial(_start_document_since, extractors, cache, isolation)
+    jobs = _effective_jobs(jobs, len(documents))
+    args = [(doc, since(doc) if since else 0.0) for doc in documents]
+
+    results: Iterable[list[Annotation] | None]
+    if jobs > 1:
+        logger.debug(f"Extracting {len(documents)} documents with {jobs} jobs.")
+        results = _merge_timings(
+            _map_parallel(partial(_collect_timings, worker), args, jobs)
+        )
+    else:
+        results = starmap(worker, args)
+
+    for doc, annotations in zip(documents, results):
+        if annotations is None:
+            # have to remove curlys or papis logger gets upset
+            desc = re.sub("[{}]", "", papis.document.describe(doc))
+            logger.info(
+                f"Document {desc} has no valid extractors for any of its files."
+            )
+        yield doc, annotations or []
+
+
+def _start_document_since(
+    extractors: Sequence[Extractor],
+    cache: ExtractionCache | None,
+    isolation: "Isolation | None",
+    document: Document,
+    since: float,
+) -> list[Annotation] | None:
+    return start_document(
+        document, extractors, cache=cache, since=since, isolation=isolation
+    )
+
+
+def _collect_timings(
+    worker: Callable[[Document, float], list[Annotation] | None],
+    document: Document,
+    since: float,
+) -> tuple[list[Annotation] | None, list[profiling.Timing]]:
+    """Run the worker and return its result with the timings it recorded."""
+    # forget timings inherited from the main process when forking
+    profiling.drain()
+    result = worker(document, since)
+    return result, profiling.drain()
+
+
+def _merge_timings(
+    results: Iterable[tuple[list[Annotation] | None, list[profiling.Timing]]],
+) -> Iterator[list[Annotation] | None]:
+    for result, timings in results:
+        profiling.record(timings)
+        yield result
+
+
+def _map_parallel(
+    worker: Callable[[Document, float], T],
+    args: Iterable[tuple[Document, float]],
+    jobs: int,
+) -> Iterator[T]:
+    """Map the worker over all arguments in a process pool, preserving order.
+
+    Only keeps a few documents per job in flight, so that finished results
+    do not pile up in memory if they are consumed slower than extracted.
+    """
+    buffered = jobs * 2
+    # fork, so that workers inherit the complete papis configuration
+    with multiprocessing.get_context("fork").Pool(jobs) as pool:
+        pending: deque[AsyncResult[T]] = deque()
+        for arg in args:
+            pending.append(pool.apply_async(worker, arg))
+            if len(pending) >= buffered:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def _effective_jobs(jobs: int, documents: int) -> int:
+    """Return the amount of worker processes to actually use.
+
+    A value of 0 uses all available cores. Falls back to a single
+    job if the platform can not safely fork worker processes.
+    """
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    if jobs > 1 and (
+        sys.platform == "darwin"
+        or "fork" not in multiprocessing.get_all_start_methods()
+    ):
+        logger.debug("Parallel extraction not supported, extracting serially.")
+        return 1
+    return min(jobs, documents)
@@ -1,20 +1,46 @@
+from collections.abc import Iterable
 from importlib.util import find_spec
 
 import papis.logging
 
 from papis_extract.extraction import Extractor
-from papis_extract.extractors import pdf, readera, readest
-from papis_extract.extractors.pocketbook import PocketBookExtractor
+from papis_extract.registry import LazyRegistry, lazy
 
 logger = papis.logging.get_logger(__name__)
 
-all_extractors: dict[str, Extractor] = {}
+# extractors are only imported and created when first used, since they
+# pull in heavy dependencies like pymupdf or bs4
+all_extractors: LazyRegistry[Extractor] = LazyRegistry()
+# the kinds of files handled by the built-in extractors, see Extractor.file_types
+_file_types: dict[str, frozenset[str]] = {}
 
-all_extractors["pdf"] = pdf.PdfExtractor()
-all_extractors["readera"] = readera.ReadEraExtractor()
-all_extractors["readest"] = readest.ReadestExtractor()
+
+def _register(name: str, module: str, cls: str, file_types: frozenset[str]) -> None:
+    all_extractors.register(
+        name, lambda: lazy(f"papis_extract.extractors.{module}", cls)()()
+    )
+    _file_types[name] = file_types
+
+
+def extractors_for(kinds: Iterable[str]) -> list[Extractor]:
+    """Return all extractors which handle any of the kinds of files.
+
+    Only imports the matching built-in extractors. Extractors added to
+    the registry from elsewhere are always returned.
+    """
+    kinds = set(kinds)
+    return [
+        all_extractors[name]
+        for name in all_extractors
+        if name not in _file_types or _file_types[name] & kinds
+    ]
+
+
+_register("pdf", "pdf", "PdfExtractor", frozenset({"pdf"}))
+_register("readera", "readera", "ReadEraExtractor", frozenset({"text"}))
+_register("readest", "readest", "ReadestExtractor", frozenset({"text"}))
 
 if find_spec("bs4") and find_spec("magic"):
-    all_extractors["pocketbook"] = PocketBookExtractor()
+    _register("pocketbook", "pocketbook", "PocketBookExtractor", frozenset({"html"}))
 else:
     logger.debug("pocketbook extractor not activated.")
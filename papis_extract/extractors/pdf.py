@@ -1,26 +1,111 @@
 # pyright: strict, reportMissingTypeStubs=false, reportUnknownMemberType=false
-import mimetypes
+import re
+from bisect import bisect_left, bisect_right
 from collections.abc import Generator
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import cached_property
 from pathlib import Path
-from typing import NamedTuple, cast
+from typing import cast
 
 import Levenshtein
 import papis.config
 import papis.logging
 import pymupdf as mu
 
+from papis_extract import classifier
 from papis_extract.annotation import Annotation
 from papis_extract.exceptions import ExtractionError
 
 logger = papis.logging.get_logger(__name__)
 
+# names of the annotation types marking text through quadpoints
+TEXT_MARKUP_TYPES = frozenset({"Highlight", "Underline", "Squiggly", "StrikeOut"})
+# annotated pages after which a document is reopened to free its memory
+REOPEN_PAGES = 500
 
-class PdfAnnot(NamedTuple):
-    page: mu.Page
-    annot: mu.Annot
+
+# x0, y0, x1, y1, word, block number, line number, word number
+Word = tuple[float, float, float, float, str, int, int, int]
+
+
+class PageWords:
+    """The text layout of a single page.
+
+    Extracts all words of a page with their bounding boxes only once
+    and keeps them sorted by their vertical center, so that the text
+    covered by any amount of areas on the page can be looked up without
+    extracting the page text again for each of them.
+    """
+
+    def __init__(self, page: mu.Page) -> None:
+        self.page = page
+
+    @cached_property
+    def _words(self) -> list[Word]:
+        words = cast("list[Word]", self.page.get_text("words"))
+        return sorted(words, key=lambda w: (w[1] + w[3]) / 2)
+
+    @cached_property
+    def _centers(self) -> list[float]:
+        return [(w[1] + w[3]) / 2 for w in self._words]
+
+    def text_in(self, areas: list[mu.Rect]) -> str:
+        """Return all words whose center lies in any of the areas.
+
+        Words are returned in reading order, separated by single spaces.
+        """
+        found: dict[tuple[int, int, int], str] = {}
+        for area in areas:
+            left, top, right, bottom = cast("tuple[float, float, float, float]", area)
+            start = bisect_left(self._centers, top)
+            end = bisect_right(self._centers, bottom)
+            for x0, _, x1, _, word, block, line, nr in self._words[start:end]:
+                if left <= (x0 + x1) / 2 <= right:
+                    found[(block, line, nr)] = word
+        return " ".join(found[position] for position in sorted(found))
+
+
+# D:YYYYMMDDHHmmSSOHH'mm' where everything after the year is optional
+_PDF_DATE = re.compile(
+    r"(?:D:)?(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?"
+    r"(?:([Zz])|([+-])(\d{2})'?(\d{2})?'?)?"
+)
+
+
+def parse_pdf_date(value: str) -> float:
+    """Return the timestamp of a PDF date string, or 0 if it is invalid.
+
+    Dates without any timezone are taken to be in local time.
+    """
+    match = _PDF_DATE.match(value.strip())
+    if not match:
+        return 0.0
+    year, month, day, hour, minute, second, utc, sign, tz_hour, tz_minute = (
+        match.groups()
+    )
+    tz: tzinfo | None = None
+    if utc:
+        tz = timezone.utc
+    elif sign:
+        offset = timedelta(hours=int(tz_hour), minutes=int(tz_minute or 0))
+        tz = timezone(-offset if sign == "-" else offset)
+    try:
+        return datetime(
+            int(year),
+            int(month or 1),
+            int(day or 1),
+            int(hour or 0),
+            int(minute or 0),
+            int(second or 0),
+            tzinfo=tz,
+        ).timestamp()
+    except (ValueError, OverflowError):
+        return 0.0
 
 
 class PdfExtractor:
+    file_types: frozenset[str] = frozenset({"pdf"})
+
     def can_process(self, filename: Path) -> bool:
         if not filename.is_file():
             logger.error(f"File {str(filename)} not readable.")
@@ -32,55 +117,142 @@ class PdfExtractor:
         logger.debug(f"Found processable annotation file: {filename}")
         return True
 
-    def run(self, filename: Path) -> list[Annotation]:
+    def run(self, filename: Path, since: float = 0.0) -> list[Annotation]:
         """Extract annotations from a file.
 
         Returns all readable annotations contained in the file
         passed in. Only returns Highlight or Text annotations.
+
+        Annotations last modified at or before the `since` timestamp are
+        skipped without looking up their text, annotations without any
+        modification date are always extracted.
         """
-        annotations: list[Annotation] = []
+        annotations = list(self.iter_annotations(filename, since))
+        logger.debug(
+            f"Found {len(annotations)} "
+            f"{'annotation' if len(annotations) == 1 else 'annotations'} for {filename}."
+        )
+        return annotations
+
+    def iter_annotations(
+        self,
+        filename: Path,
+        since: float = 0.0,
+        max_annotations: int = 0,
+        max_pages: int = 0,
+    ) -> Generator[Annotation]:
+        """Extract the annotations of a file page by page.
+
+        Yields the same annotations as :meth:`run`, but only ever holds a
+        single page and its text layout in memory: each page is released
+        before its annotations are handed out, and the document is reopened
+        every few hundred pages to empty the caches of MuPDF, so that memory
+        use stays the same no matter how many pages the document has.
+
+        Stops after `max_annotations` annotations or `max_pages` annotated
+        pages if they are set.
+        """
+        # shared between all annotations of the file
+        file = str(filename)
+        found = 0
         try:
-            for page, annot in self._all_pdf_annots(filename):
-                quote, note = self._get_annotation_content(page, annot)
-                if not quote and not note:
-                    continue
+            doc = mu.Document(filename)
+            try:
+                pages = self._annotated_pages(doc)
+                if not pages:
+                    logger.debug(f"No annotated pages in {filename}.")
+                    return
+                if max_pages:
+                    pages = pages[:max_pages]
+                for count, page_nr in enumerate(pages):
+                    if count and count % REOPEN_PAGES == 0:
+                        doc = self._reopen(doc, filename)
+                    for a in self._page_annotations(doc, page_nr, file, since):
+                        yield a
+                        found += 1
+                        if found == max_annotations:
+                            return
+            finally:
+                if not doc.is_closed:
+                    doc.close()
+        except mu.FileDataError:
+            raise ExtractionError
+
+    def _reopen(self, doc: mu.Document, filename: Path) -> mu.Document:
+        """Close and reopen the document to free everything MuPDF loaded.
+
+        MuPDF keeps every object it parsed from a document, like the page
+        and annotation dictionaries, in memory until the document is closed.
+        """
+        doc.close()
+        mu.TOOLS.store_shrink(100)
+        return mu.Document(filename)
 
-                color = self._get_correct_color(annot)
-                page_nr: int = cast("int", page.number or 0)
-                highlight_type: str = cast("str", annot.type[1] or "")
+    def _page_annotations(
+        self, doc: mu.Document, page_nr: int, file: str, since: float
+    ) -> list[Annotation]:
+        """Return the annotations of a single page.
 
-                a = Annotation(
-                    file=str(filename),
+        The page, its annotation objects and its text layout are only
+        referenced from here, so they are freed as soon as this returns.
+        """
+        page = doc.load_page(page_nr)
+        words = PageWords(page)
+        annotations: list[Annotation] = []
+        annot: mu.Annot
+        for annot in page.annots():
+            modified = self._get_modification_time(annot)
+            if since and modified and modified <= since:
+                continue
+
+            quote, note = self._get_annotation_content(words, annot)
+            if not quote and not note:
+                continue
+
+            annotations.append(
+                Annotation(
+                    file=file,
                     content=quote or "",
                     note=note or "",
-                    color=color,
-                    type=highlight_type,
+                    color=self._get_correct_color(annot),
+                    type=cast("str", annot.type[1] or ""),
                     page=page_nr,
+                    # generated names like 'fitz-A0' repeat on every page
+                    id=f"{page_nr}:{annot.info.get('id') or f'xref:{annot.xref}'}",
+                    modified=modified,
                 )
-                annotations.append(a)
-            logger.debug(
-                f"Found {len(annotations)} "
-                f"{'annotation' if len(annotations) == 1 else 'annotations'} for {filename}."
             )
-
-        except mu.FileDataError:
-            raise ExtractionError
-
         return annotations
 
-    def _all_pdf_annots(self, filename: Path) -> Generator[PdfAnnot]:
-        with mu.Document(filename) as doc:
-            for page in doc:
-                annot: mu.Annot
-                for annot in page.annots():
-                    yield PdfAnnot(page, annot)
+    def _annotated_pages(self, doc: mu.Document) -> list[int]:
+        """Return the numbers of all pages which carry annotations.
+
+        Only looks up the /Annots entry of every page object through the
+        xref table instead of loading and parsing each page, so that large
+        documents with few annotations do not have to be fully loaded.
+        """
+        pages: list[int] = []
+        page_count = cast("int", doc.page_count)
+        try:
+            for page_nr in range(page_count):
+                xref = cast("int", doc.page_xref(page_nr))
+                kind, value = cast("tuple[str, str]", doc.xref_get_key(xref, "Annots"))
+                if kind != "null" and value.replace(" ", "") != "[]":
+                    pages.append(page_nr)
+        except (RuntimeError, ValueError):
+            logger.debug("Could not look up annotated pages, checking all pages.")
+            return list(range(page_count))
+        return pages
 
     def _is_pdf(self, fname: Path) -> bool:
-        """Check if file is a pdf, using mime type."""
-        return mimetypes.guess_type(fname)[0] == "application/pdf"
+        """Check if file is a pdf, using its magic bytes or mime type."""
+        try:
+            return classifier.classify(fname).kind == "pdf"
+        except OSError:
+            return False
 
     def _get_annotation_content(
-        self, page: mu.Page, annotation: mu.Annot
+        self, words: PageWords, annotation: mu.Annot
     ) -> tuple[str | None, str | None]:
         """Gets the text content of an annotation.
 
@@ -92,7 +264,7 @@ class PdfExtractor:
         Levenshtein distance.
         """
         content = cast("str", annotation.info["content"].replace("\n", " "))
-        written = page.get_textbox(annotation.rect).replace("\n", " ")
+        written = words.text_in(self._get_annotation_areas(annotation))
 
         # highlight with selection in note
         minimum_similarity = (
@@ -113,6 +285,23 @@ class PdfExtractor:
         # just a highlight without any text
         return (None, None)
 
+    def _get_annotation_areas(self, annotation: mu.Annot) -> list[mu.Rect]:
+        """Return the areas on the page an annotation marks.
+
+        Uses the quadpoints of text markup annotations (one quad per
+        highlighted line) so that multi-line highlights do not include text
+        of neighbouring columns, and the annotation rect for all others.
+        """
+        vertices = cast("list[tuple[float, float]] | None", annotation.vertices)
+        if annotation.type[1] not in TEXT_MARKUP_TYPES or not vertices:
+            return [annotation.rect]
+        return [mu.Quad(vertices[i : i + 4]).rect for i in range(0, len(vertices), 4)]
+
+    def _get_modification_time(self, annot: mu.Annot) -> float:
+        """Return when an annotation was last changed, or 0 if unknown."""
+        info = cast("dict[str, str]", annot.info)
+        return parse_pdf_date(info.get("modDate") or info.get("creationDate") or "")
+
     def _get_correct_color(self, annot: mu.Annot):
         color: tuple[float, float, float] = cast(
             "tuple[float, float, float]",
@@ -6,16 +6,23 @@ from typing import cast
 import papis.logging
 from bs4 import BeautifulSoup
 
+from papis_extract import classifier
 from papis_extract.annotation import COLORS, Annotation
 
 logger = papis.logging.get_logger(__name__)
 
 
 class PocketBookExtractor:
+    file_types: frozenset[str] = frozenset({"html"})
+
     def can_process(self, filename: Path) -> bool:
         if not self._is_html(filename):
             return False
 
+        # cheaply reject other html files before parsing them
+        if not self._has_generator_marker(filename):
+            return False
+
         content = self._read_file(filename)
         if not content:
             return False
@@ -32,7 +39,13 @@ class PocketBookExtractor:
     def _is_html(self, filename: Path) -> bool:
         return mimetypes.guess_type(filename)[0] == "text/html"
 
-    def run(self, filename: Path) -> list[Annotation]:
+    def _has_generator_marker(self, filename: Path) -> bool:
+        try:
+            return b"PocketBook Bookmarks Export" in classifier.classify(filename).head
+        except OSError:
+            return False
+
+    def run(self, filename: Path, since: float = 0.0) -> list[Annotation]:
         """Extract annotations from pocketbook html file.
 
         Export annotations from pocketbook app and load add them
@@ -47,6 +60,8 @@ class PocketBookExtractor:
         html = BeautifulSoup(content, features="xml")
 
         annotations: list[Annotation] = []
+        # shared between all annotations of the file
+        file = str(filename)
         for bm in html.select("div.bookmark"):
             content = str(
                 (bm.select_one("div.bm-text>p") or html.new_string("")).text or ""
@@ -64,7 +79,7 @@ class PocketBookExtractor:
                     break
 
             a = Annotation(
-                file=str(filename),
+                file=file,
                 content=content,
                 note=note,
                 color=color,
@@ -81,7 +96,7 @@ class PocketBookExtractor:
 
     def _read_file(self, filename: Path) -> str:
         try:
-            with filename.open("r") as fr:
+            with classifier.classify(filename).open_text() as fr:
                 return fr.read()
         except FileNotFoundError:
             logger.error(f"Could not open file {filename} for extraction.")
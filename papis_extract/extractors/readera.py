@@ -5,6 +5,7 @@ from pathlib import Path
 
 import papis.logging
 
+from papis_extract import classifier
 from papis_extract.annotation import Annotation
 
 logger = papis.logging.get_logger(__name__)
@@ -16,24 +17,23 @@ class ReadEraExtractor:
     https://readera.org/
     """
 
+    file_types: frozenset[str] = frozenset({"text"})
+
     def can_process(self, filename: Path) -> bool:
         if not self._is_txt(filename):
             return False
 
-        content = self._read_file(filename)
-        if not content:
+        try:
+            info = classifier.classify(filename)
+        except OSError:
             return False
 
         # look for title and author lines up top
-        if not content[0] or not content[1]:
-            return False
-
-        # look for star-shaped divider pattern
-        if not re.search(r"\n\*\*\*\*\*\n", "".join(content)):
+        if len(info.head_text().splitlines()) < 2:
             return False
 
-        # look for star-shaped pattern at end of file
-        if not re.search(r"\n\*\*\*\*\*\n\n$", "".join(content)):
+        # look for star-shaped divider pattern at end of file
+        if not info.tail_text().endswith("\n*****\n\n"):
             return False
 
         logger.debug(f"Found processable annotation file: {filename}")
@@ -42,7 +42,7 @@ class ReadEraExtractor:
     def _is_txt(self, filename: Path) -> bool:
         return mimetypes.guess_type(filename)[0] == "text/plain"
 
-    def run(self, filename: Path) -> list[Annotation]:
+    def run(self, filename: Path, since: float = 0.0) -> list[Annotation]:
         """Extract annotations from readera txt file.
 
         Returns all readable annotations contained in the file passed in, with
@@ -55,6 +55,8 @@ class ReadEraExtractor:
             return []
 
         annotations: list[Annotation] = []
+        # shared between all annotations of the file
+        file = str(filename)
 
         # split for *** separators and remove the last entry since it is always
         # empty
@@ -70,7 +72,7 @@ class ReadEraExtractor:
             entry = re.sub(r"\n", " ", entry)
 
             a = Annotation(
-                file=str(filename),
+                file=file,
                 content=entry,
                 note=note if note else "",
                 # color=color, # TODO: Implement for premium ReadEra version
@@ -85,7 +87,7 @@ class ReadEraExtractor:
 
     def _read_file(self, filename: Path) -> list[str]:
         try:
-            with filename.open("r") as fr:
+            with classifier.classify(filename).open_text() as fr:
                 return fr.readlines()
         except FileNotFoundError:
             logger.error(f"Could not open file {filename} for extraction.")
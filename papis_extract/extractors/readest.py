@@ -4,12 +4,13 @@ from pathlib import Path
 
 import papis.logging
 
+from papis_extract import classifier
 from papis_extract.annotation import Annotation
 
 logger = papis.logging.get_logger(__name__)
 
 ACCEPTED_EXTENSIONS = [".txt", ".md", ".qmd", ".rmd"]
-TEXTCHARS = bytearray({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+EXPORT_MARKER = re.compile(r"\n\*\*Exported from Readest\*\*: \d{4}-\d{2}-\d{2}\n")
 
 
 class ReadestExtractor:
@@ -18,18 +19,14 @@ class ReadestExtractor:
     https://readest.com/
     """
 
+    file_types: frozenset[str] = frozenset({"text"})
+
     def can_process(self, filename: Path) -> bool:
         if not self._is_readable_text(filename):
             return False
 
-        content = self._read_file(filename)
-        if not content:
-            return False
-
-        # look for star-shaped divider pattern
-        if not re.search(
-            r"\n\*\*Exported from Readest\*\*: \d{4}-\d{2}-\d{2}\n", "".join(content)
-        ):
+        # look for export marker below the title and author lines
+        if not EXPORT_MARKER.search(classifier.classify(filename).head_text()):
             return False
 
         logger.debug(f"Found processable annotation file: {filename}")
@@ -39,19 +36,19 @@ class ReadestExtractor:
         """Checks whether a file has a valid text extension and is not a binary file.
 
         A file is considered a valid text file if its extension is in
-        :data:`ACCEPTED_EXTENSIONS` and does not contain any non-text characters.
+        :data:`ACCEPTED_EXTENSIONS` and its beginning does not contain any
+        non-text characters.
 
         :returns: A boolean indicating whether the file is a valid text file.
         """
         if filename.suffix not in ACCEPTED_EXTENSIONS:
             return False
         try:
-            with filename.open("rb") as rb:
-                return not bool(rb.read(1024).translate(None, TEXTCHARS))
-        except (FileNotFoundError, PermissionError):
+            return classifier.classify(filename).kind == "text"
+        except OSError:
             return False
 
-    def run(self, filename: Path) -> list[Annotation]:
+    def run(self, filename: Path, since: float = 0.0) -> list[Annotation]:
         """Extract annotations from readest txt file.
 
         Returns all readable annotations contained in the file passed in, with
@@ -62,6 +59,8 @@ class ReadestExtractor:
             return []
 
         annotations: list[Annotation] = []
+        # shared between all annotations of the file
+        file = str(filename)
 
         for i, line in enumerate(content):
             entry_content: str = ""
@@ -73,7 +72,7 @@ class ReadestExtractor:
                     entry_note = nextline.removeprefix("**Note**:: ").strip()
 
                 a = Annotation(
-                    file=str(filename),
+                    file=file,
                     content=entry_content,
                     note=entry_note,
                     # NOTE: Unfortunately Readest currently does not export color information
@@ -89,7 +88,7 @@ class ReadestExtractor:
 
     def _read_file(self, filename: Path) -> list[str]:
         try:
-            with filename.open("r") as fr:
+            with classifier.classify(filename).open_text() as fr:
                 return fr.readlines()
         except FileNotFoundError:
             logger.error(f"Could not open file {filename} for extraction.")
@@ -1,8 +1,29 @@
+import csv
+import io
+import json
+import re
+from collections.abc import Iterable, Iterator
+from functools import partial
+from itertools import chain
 from typing import Protocol
 
+import papis.logging
 from papis.document import Document
 
-from papis_extract.annotation import Annotation
+from papis_extract import config
+from papis_extract.annotation import Annotation, compile_template
+
+logger = papis.logging.get_logger(__name__)
+
+# templates are only compiled on first use, to not import chevron on startup
+MARKDOWN_TEMPLATE = (
+    "{{#tag}}#{{tag}}\n{{/tag}}"
+    "{{#quote}}> {{quote}}{{/quote}}{{#page}} [p. {{page}}]{{/page}}"
+    "{{#note}}\n  NOTE: {{note}}{{/note}}"
+)
+# empty lines between blocks, keeping the indentation of the following line
+_empty_lines = re.compile(r"\n(?:[ \t]*\n)+")
+CSV_HEADER = ("type", "tag", "page", "quote", "note", "author", "title", "ref", "file")
 
 
 class Formatter(Protocol):
@@ -24,38 +45,77 @@ class Formatter(Protocol):
     ) -> str: ...
 
 
-def format_markdown(
-    document: Document = Document(),
-    annotations: list[Annotation] = [],
+class BlockFormatter(Protocol):
+    """Formatter handing out its output block by block.
+
+    Works like a :class:`Formatter`, but instead of a single string it
+    returns an iterator of blocks, e.g. a heading followed by one block
+    per annotation. Every block ends with the separator to whatever
+    follows it, including the next document, so that exporters can
+    write the blocks one after another without joining them first.
+    """
+
+    def __call__(
+        self, document: Document, annotations: list[Annotation], first: bool
+    ) -> Iterator[str]: ...
+
+
+def formatted_blocks(
+    formatter: Formatter | BlockFormatter,
+    document: Document,
+    annotations: list[Annotation],
+    first: bool = False,
+) -> Iterator[str]:
+    """Return the formatted blocks of a document from any kind of formatter.
+
+    The output of a formatter returning a single string is split into
+    blocks at its empty lines, the last one separated from the next
+    document by an empty line.
+    """
+    output = formatter(document, annotations, first=first)
+    if isinstance(output, str):
+        for block in _empty_lines.split(output.strip("\n")):
+            if block:
+                yield block + "\n\n"
+        return
+    yield from output
+
+
+def _joined(blocks: Iterable[str]) -> str:
+    return "".join(blocks).rstrip()
+
+
+def markdown_blocks(
+    document: Document,
+    annotations: list[Annotation],
     first: bool = False,
     headings: str = "setext",  # setext | atx | None
-) -> str:
+) -> Iterator[str]:
     if not annotations:
-        return ""
-    template = (
-        "{{#tag}}#{{tag}}\n{{/tag}}"
-        "{{#quote}}> {{quote}}{{/quote}}{{#page}} [p. {{page}}]{{/page}}"
-        "{{#note}}\n  NOTE: {{note}}{{/note}}"
-    )
-    output = ""
+        return
 
     heading = f"{document.get('title', '')} - {document.get('author', '')}"
     if headings == "atx":
-        output += f"# {heading}\n\n"
+        yield f"# {heading}\n\n"
     elif headings == "setext":
         title_decoration = (
             f"{'=' * len(document.get('title', ''))}   "
             f"{'-' * len(document.get('author', ''))}"
         )
-        output += f"{title_decoration}\n{heading}\n{title_decoration}\n\n"
+        yield f"{title_decoration}\n{heading}\n{title_decoration}\n\n"
 
+    template = compile_template(MARKDOWN_TEMPLATE)
     for a in annotations:
-        output += a.format(template)
-        output += "\n\n"
+        yield a.format(template) + "\n\n"
 
-    output += "\n\n\n"
 
-    return output.rstrip()
+def format_markdown(
+    document: Document = Document(),
+    annotations: list[Annotation] = [],
+    first: bool = False,
+    headings: str = "setext",  # setext | atx | None
+) -> str:
+    return _joined(markdown_blocks(document, annotations, first, headings))
 
 
 def format_markdown_atx(
@@ -74,24 +134,61 @@ def format_markdown_setext(
     return format_markdown(document, annotations, headings="setext")
 
 
+def count_blocks(
+    document: Document,
+    annotations: list[Annotation],
+    first: bool = False,
+) -> Iterator[str]:
+    if not annotations:
+        return
+
+    yield (
+        f"{len(annotations)} "
+        f"{document.get('author', '')}"
+        f"{': ' if 'author' in document else ''}"  # only put separator if author
+        f"{document.get('title', '')}"
+    ).rstrip() + "\n\n"
+
+
 def format_count(
     document: Document = Document(),
     annotations: list[Annotation] = [],
     first: bool = False,
 ) -> str:
-    if not annotations:
-        return ""
+    return _joined(count_blocks(document, annotations, first))
 
-    count = 0
-    for _ in annotations:
-        count += 1
 
-    return (
-        f"{count} "
-        f"{document.get('author', '')}"
-        f"{': ' if 'author' in document else ''}"  # only put separator if author
-        f"{document.get('title', '')}"
-    ).rstrip()
+def csv_blocks(
+    document: Document,
+    annotations: list[Annotation],
+    first: bool = False,
+) -> Iterator[str]:
+    """Format the annotations as RFC 4180 CSV, one row per annotation.
+
+    Fields are only quoted where needed, with quotes and line breaks
+    within them escaped, so that any CSV reader can parse the output.
+    """
+    if not annotations:
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    author, title, ref = (
+        document.get("author", ""),
+        document.get("title", ""),
+        document.get("ref", ""),
+    )
+    rows: Iterable[tuple[object, ...]] = (
+        (a.type, a.tag, a.page, a.content, a.note, author, title, ref, a.file)
+        for a in annotations
+    )
+    if first:
+        rows = chain([CSV_HEADER], rows)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
 
 
 def format_csv(
@@ -99,26 +196,87 @@ def format_csv(
     annotations: list[Annotation] = [],
     first: bool = False,
 ) -> str:
-    header: str = "type,tag,page,quote,note,author,title,ref,file"
-    template: str = (
-        '{{type}},{{tag}},{{page}},"{{quote}}","{{note}}",'
-        '"{{doc.author}}","{{doc.title}}","{{doc.ref}}","{{file}}"'
+    # keep whitespace at the end of the last field
+    return "".join(csv_blocks(document, annotations, first)).rstrip("\n")
+
+
+def jsonl_blocks(
+    document: Document,
+    annotations: list[Annotation],
+    first: bool = False,
+) -> Iterator[str]:
+    """Format the annotations as JSON Lines, one object per annotation."""
+    ref, author, title = (
+        document.get("ref", ""),
+        document.get("author", ""),
+        document.get("title", ""),
     )
-    output = f"{header}\n" if first else ""
-    if not annotations:
-        return ""
+    for a in annotations:
+        yield (
+            json.dumps(
+                {
+                    "ref": ref,
+                    "author": author,
+                    "title": title,
+                    "file": a.file,
+                    "page": a.page,
+                    "type": a.type,
+                    "tag": a.tag,
+                    "color": a.color,
+                    "quote": a.content,
+                    "note": a.note,
+                },
+                ensure_ascii=False,
+            )
+            + "\n"
+        )
 
+
+def format_jsonl(
+    document: Document = Document(),
+    annotations: list[Annotation] = [],
+    first: bool = False,
+) -> str:
+    # keep whitespace at the end of the last field
+    return "".join(jsonl_blocks(document, annotations, first)).rstrip("\n")
+
+
+def template_blocks(
+    template: str,
+    document: Document,
+    annotations: list[Annotation],
+    first: bool = False,
+) -> Iterator[str]:
+    """Format the annotations with a user-defined mustache template.
+
+    The template is rendered for every annotation, with the annotation
+    fields available as 'quote', 'note', 'page', 'tag', 'type' and 'file'
+    and the document fields as 'doc', e.g. '{{doc.title}}'.
+    Every rendered annotation becomes a block of its own.
+    """
+    compiled = compile_template(template)
     for a in annotations:
-        output += a.format(template, doc=document)
-        output += "\n"
+        yield a.format(compiled, doc=document) + "\n\n"
+
 
-    return output.rstrip()
+def custom_formatters() -> dict[str, BlockFormatter]:
+    """Return formatters for all templates set in the plugin configuration."""
+    try:
+        templates = config.getdict("formatters", "plugins.extract")
+    except SyntaxError as e:
+        logger.error(f"Could not load custom formatters: {e}")
+        return {}
+    return {
+        name: partial(template_blocks, str(template))
+        for name, template in templates.items()
+    }
 
 
-formatters: dict[str, Formatter] = {
-    "count": format_count,
-    "csv": format_csv,
-    "markdown": format_markdown,
-    "markdown-atx": format_markdown_atx,
-    "markdown-setext": format_markdown_setext,
+formatters: dict[str, Formatter | BlockFormatter] = {
+    "count": count_blocks,
+    "csv": csv_blocks,
+    "jsonl": jsonl_blocks,
+    "markdown": markdown_blocks,
+    "markdown-atx": partial(markdown_blocks, headings="atx"),
+    "markdown-setext": partial(markdown_blocks, headings="setext"),
 }
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import pickle
+import select
+import signal
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import papis.logging
+
+from papis_extract import cache
+from papis_extract.annotation import Annotation
+from papis_extract.cache import FileIdentity
+from papis_extract.exceptions import ExtractionAborted, ExtractionError
+
+if TYPE_CHECKING:
+    from papis_extract.extraction import Extractor
+
+logger = papis.logging.get_logger(__name__)
+
+READ_SIZE = 64 * 1024
+
+
+def default_folder() -> Path:
+    return cache.default_folder() / "skipped"
+
+
+@dataclass
+class SkipList:
+    """Files which timed out or crashed during an earlier extraction.
+
+    Files are skipped by later runs until they change, that is until their
+    size or modification time differ from when they were added. Every entry
+    lives in its own file, like the extraction cache, so that worker
+    processes can add entries at the same time.
+    """
+
+    folder: Path = field(default_factory=default_folder)
+
+    def reason(self, extractor: str, filename: Path) -> str | None:
+        """Return why the file is skipped, or None if it should be extracted."""
+        entry_path = self._entry_path(extractor, filename)
+        try:
+            entry: dict[str, Any] = json.loads(entry_path.read_text())
+            identity = FileIdentity.of(filename)
+        except (OSError, ValueError):
+            return None
+        if (entry.get("size"), entry.get("mtime")) != (identity.size, identity.mtime):
+            # the file changed, so give it another try
+            entry_path.unlink(missing_ok=True)
+            return None
+        return str(entry.get("reason", ""))
+
+    def add(self, extractor: str, filename: Path, reason: str) -> None:
+        try:
+            identity = FileIdentity.of(filename)
+            self.folder.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.folder, suffix=".tmp", delete=False
+            ) as fw:
+                json.dump(
+                    {
+                        "file": str(filename),
+                        "extractor": extractor,
+                        "size": identity.size,
+                        "mtime": identity.mtime,
+                        "reason": reason,
+                    },
+                    fw,
+                )
+            Path(fw.name).replace(self._entry_path(extractor, filename))
+        except OSError as e:
+            logger.warning(f"Could not remember to skip {filename}: {e}")
+
+    def _entry_path(self, extractor: str, filename: Path) -> Path:
+        key = f"{extractor}\0{filename.resolve()}"
+        return self.folder / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+
+@dataclass
+class Isolation:
+    """Run every extraction in its own process, within a time and memory budget.
+
+    Protects the extraction run from single pathological files: a file
+    which takes longer than `timeout` seconds, needs more than `memory`
+    additional bytes or crashes the process is aborted and added to the
+    skip list, so that it is not tried again until it changes.
+    A limit of 0 disables it.
+
+    Needs to fork the process, so extracts in-process on platforms which
+    can not do so.
+    """
+
+    timeout: float = 0.0
+    memory: int = 0
+    skipped: SkipList = field(default_factory=SkipList)
+
+    def run(
+        self, extractor: "Extractor", filename: Path, since: float = 0.0
+    ) -> list[Annotation]:
+        """Extract the file in a child process.
+
+        Raises an :class:`ExtractionAborted` if the child process ran out of
+        time or memory or crashed, and re-raises extraction errors of the
+        extractor as an :class:`ExtractionError`.
+        """
+        if not hasattr(os, "fork"):
+            return extractor.run(filename, since=since)
+
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                os.close(read_fd)
+                self._run_child(extractor, filename, since, write_fd)
+                exit_code = 0
+            finally:
+                # never return into the code of the parent process
+                os._exit(exit_code)
+
+        os.close(write_fd)
+        try:
+            data = self._read_result(read_fd)
+        except BaseException:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            raise
+        finally:
+            os.close(read_fd)
+        _, status = os.waitpid(pid, 0)
+
+        if not data:
+            if os.WIFSIGNALED(status):
+                raise ExtractionAborted(f"crashed with signal {os.WTERMSIG(status)}")
+            raise ExtractionAborted(f"crashed with exit code {os.WEXITSTATUS(status)}")
+        try:
+            kind, result = pickle.loads(data)
+        except (pickle.UnpicklingError, EOFError, ValueError) as e:
+            raise ExtractionAborted(f"crashed while sending its result: {e}") from e
+        if kind == "error":
+            raise ExtractionError(result)
+        if kind == "aborted":
+            raise ExtractionAborted(result)
+        return result
+
+    def _run_child(
+        self, extractor: "Extractor", filename: Path, since: float, write_fd: int
+    ) -> None:
+        """Extract the file and send the result to the parent process."""
+        if self.memory:
+            _limit_memory(_address_space() + self.memory)
+        try:
+            result: tuple[str, Any] = ("ok", extractor.run(filename, since=since))
+        except ExtractionError as e:
+            result = ("error", str(e))
+        except MemoryError:
+            result = ("aborted", "ran out of memory")
+        except Exception as e:  # noqa: BLE001 - any crash has to reach the parent
+            result = ("aborted", f"crashed with {type(e).__name__}: {e}")
+        with os.fdopen(write_fd, "wb") as fw:
+            pickle.dump(result, fw, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _read_result(self, read_fd: int) -> bytes:
+        """Read the result of the child process until it runs out of time."""
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        chunks: list[bytes] = []
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            ready, _, _ = select.select([read_fd], [], [], remaining)
+            if not ready:
+                break
+            chunk = os.read(read_fd, READ_SIZE)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+        raise ExtractionAborted(f"timed out after {self.timeout:g} seconds")
+
+
+def _limit_memory(limit: int) -> None:
+    import resource
+
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError) as e:
+        logger.debug(f"Could not limit extraction memory: {e}")
+
+
+def _address_space() -> int:
+    """Return the size of the address space of this process, if known."""
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[0])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
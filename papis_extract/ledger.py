@@ -0,0 +1,122 @@
+import hashlib
+import re
+from collections.abc import Iterable
+from pathlib import Path
+
+import papis.logging
+
+from papis_extract.annotation import Annotation
+
+logger = papis.logging.get_logger(__name__)
+
+LEDGER_VERSION = 1
+_whitespace = re.compile(r"\s+")
+
+
+def fingerprint(annotation: Annotation) -> str:
+    """Return a stable fingerprint of the annotation.
+
+    The fingerprint only depends on the name of the annotated file, the page
+    and the quote and note of the annotation, ignoring case and whitespace
+    differences, so that it stays the same across extractions and library
+    moves.
+    """
+    parts = [
+        Path(annotation.file).name,
+        str(annotation.page),
+        _normalize(annotation.content),
+        _normalize(annotation.note),
+    ]
+    return hashlib.blake2b(
+        "\0".join(parts).encode(), digest_size=16, usedforsecurity=False
+    ).hexdigest()
+
+
+def _normalize(text: str) -> str:
+    return _whitespace.sub(" ", text).strip().lower()
+
+
+class Ledger:
+    """The fingerprints of all annotations already exported to a note.
+
+    The ledger is kept as a sidecar file next to the note, so that
+    annotations which were already written can be recognized with a
+    simple lookup instead of comparing them with the whole note.
+    A ledger is only trusted as long as its note still has content:
+    if the note is removed or emptied, all annotations count as new again.
+    """
+
+    def __init__(self, note: Path) -> None:
+        self.note = note
+        self.path = note.with_name(f".{note.name}.extracted")
+        self._fingerprints: set[str] = set()
+        self._recorded: list[str] = []
+        if _has_content(note):
+            self._fingerprints = self._read()
+
+    def __contains__(self, annotation: Annotation) -> bool:
+        return fingerprint(annotation) in self._fingerprints
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def unexported(self, annotations: Iterable[Annotation]) -> list[Annotation]:
+        """Return only the annotations which have not been exported yet."""
+        return [a for a in annotations if a not in self]
+
+    def record(self, annotations: Iterable[Annotation]) -> None:
+        """Remember the annotations as exported.
+
+        The annotations are only written to the ledger file with :meth:`save`.
+        """
+        for a in annotations:
+            fp = fingerprint(a)
+            if fp not in self._fingerprints:
+                self._fingerprints.add(fp)
+                self._recorded.append(fp)
+
+    def save(self) -> bool:
+        """Write all newly recorded fingerprints to the ledger file.
+
+        New fingerprints are appended to an existing ledger; a ledger that
+        belongs to an older version or to an emptied note is replaced.
+        Returns whether the ledger file changed.
+        """
+        if not self._recorded:
+            return False
+        append = self.path.exists() and len(self._fingerprints) > len(self._recorded)
+        try:
+            if append:
+                with self.path.open("a") as f:
+                    f.writelines(f"{fp}\n" for fp in self._recorded)
+            else:
+                tmp = self.path.with_name(f"{self.path.name}.tmp")
+                with tmp.open("w") as f:
+                    f.write(f"# papis-extract ledger v{LEDGER_VERSION}\n")
+                    f.writelines(f"{fp}\n" for fp in self._recorded)
+                tmp.replace(self.path)
+        except OSError as e:
+            logger.warning(f"Could not save exported annotations to {self.path}: {e}")
+            return False
+        self._recorded = []
+        return True
+
+    def _read(self) -> set[str]:
+        try:
+            with self.path.open() as f:
+                header = f.readline()
+                if header.strip() != f"# papis-extract ledger v{LEDGER_VERSION}":
+                    return set()
+                return {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+        except OSError as e:
+            logger.warning(f"Could not read exported annotations from {self.path}: {e}")
+            return set()
+
+
+def _has_content(path: Path) -> bool:
+    try:
+        return path.stat().st_size > 0
+    except OSError:
+        return False
@@ -0,0 +1,143 @@
+import json
+import time
+from collections.abc import Generator, Iterable
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import papis.document
+from papis.document import Document
+
+# amount of slowest documents and files shown in the summary
+SUMMARY_TOP = 10
+
+_disabled: AbstractContextManager[None] = nullcontext()
+
+
+@dataclass
+class Timing:
+    stage: str
+    wall: float
+    cpu: float
+    document: str = ""
+    file: str = ""
+
+
+@dataclass
+class Profile:
+    """Wall and CPU time spent in the stages of an extraction run."""
+
+    timings: list[Timing] = field(default_factory=list[Timing])
+
+    @contextmanager
+    def measure(
+        self, stage: str, document: Document | None, file: Path | str | None
+    ) -> Generator[None]:
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.timings.append(
+                Timing(
+                    stage,
+                    time.perf_counter() - wall,
+                    time.process_time() - cpu,
+                    papis.document.describe(document) if document is not None else "",
+                    str(file or ""),
+                )
+            )
+
+    def stages(self) -> dict[str, dict[str, float]]:
+        """Return the amount, wall and CPU time of every stage."""
+        stages: dict[str, dict[str, float]] = {}
+        for t in self.timings:
+            stage = stages.setdefault(t.stage, {"count": 0, "wall": 0.0, "cpu": 0.0})
+            stage["count"] += 1
+            stage["wall"] += t.wall
+            stage["cpu"] += t.cpu
+        return stages
+
+    def slowest(self, by: str, top: int = SUMMARY_TOP) -> list[tuple[str, float]]:
+        """Return the documents or files with the most wall time spent on them."""
+        totals: dict[str, float] = {}
+        for t in self.timings:
+            key = getattr(t, by)
+            if key:
+                totals[key] = totals.get(key, 0.0) + t.wall
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    def summary(self) -> str:
+        lines = [f"{'stage':<32}{'count':>8}{'wall':>10}{'cpu':>10}"]
+        for name, stage in self.stages().items():
+            lines.append(
+                f"{name:<32}{stage['count']:>8}"
+                f"{stage['wall']:>9.3f}s{stage['cpu']:>9.3f}s"
+            )
+        for by in ["document", "file"]:
+            slowest = self.slowest(by)
+            if slowest:
+                lines += ["", f"slowest {by}s:"]
+                lines += [f"{wall:>9.3f}s  {key}" for key, wall in slowest]
+        return "\n".join(lines)
+
+    def write(self, path: Path) -> None:
+        path.write_text(
+            json.dumps(
+                {
+                    "stages": self.stages(),
+                    "slowest_documents": self.slowest("document"),
+                    "slowest_files": self.slowest("file"),
+                    "timings": [asdict(t) for t in self.timings],
+                },
+                indent=2,
+            )
+        )
+
+
+_active: Profile | None = None
+
+
+def enable() -> Profile:
+    """Start recording timings into a new profile and return it."""
+    global _active
+    _active = Profile()
+    return _active
+
+
+def current() -> Profile | None:
+    """Return the profile timings are currently recorded into, if any."""
+    return _active
+
+
+def disable() -> None:
+    global _active
+    _active = None
+
+
+def timed(
+    stage: str, document: Document | None = None, file: Path | str | None = None
+) -> AbstractContextManager[None]:
+    """Time the enclosed block as a stage of the running profile.
+
+    Does nothing unless profiling was enabled, and the document is only
+    described if the timing is actually recorded.
+    """
+    if _active is None:
+        return _disabled
+    return _active.measure(stage, document, file)
+
+
+def drain() -> list[Timing]:
+    """Return and forget all timings recorded so far.
+
+    Used to hand the timings of worker processes back to the main process.
+    """
+    if _active is None:
+        return []
+    timings, _active.timings = _active.timings, []
+    return timings
+
+
+def record(timings: Iterable[Timing]) -> None:
+    if _active is not None:
+        _active.timings.extend(timings)
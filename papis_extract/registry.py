@@ -0,0 +1,52 @@
+from collections.abc import Callable, Iterator, MutableMapping
+from importlib import import_module
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyRegistry(MutableMapping[str, T]):
+    """A registry of named entries which are only created when first used.
+
+    Entries are registered as factories, so that the names are known right
+    away (e.g. for the command line choices) while the modules behind them,
+    and the dependencies they pull in, are only imported once the entry is
+    actually looked up. Entries can also be set directly like in a dict.
+    """
+
+    def __init__(self) -> None:
+        self._factories: dict[str, Callable[[], T]] = {}
+        self._entries: dict[str, T] = {}
+
+    def register(self, name: str, factory: Callable[[], T]) -> None:
+        self._factories[name] = factory
+        self._entries.pop(name, None)
+
+    def __getitem__(self, name: str) -> T:
+        try:
+            return self._entries[name]
+        except KeyError:
+            entry = self._entries[name] = self._factories[name]()
+            return entry
+
+    def __setitem__(self, name: str, entry: T) -> None:
+        self._factories[name] = lambda: entry
+        self._entries[name] = entry
+
+    def __delitem__(self, name: str) -> None:
+        del self._factories[name]
+        self._entries.pop(name, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self._factories)})"
+
+
+def lazy(module: str, name: str) -> Callable[[], Any]:
+    """Return a factory importing the object from the module when called."""
+    return lambda: getattr(import_module(module), name)
@@ -0,0 +1,76 @@
+import math
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+
+import Levenshtein
+
+
+class SimilarityIndex:
+    """An index of strings to quickly find those similar to another string.
+
+    Similarity is the normalized indel similarity as computed by
+    :func:`Levenshtein.ratio`, which is twice the longest common subsequence
+    of two strings divided by their combined length. Since the common
+    subsequence can never be longer than the shorter string, two strings can
+    only be similar enough if their lengths are close enough. The index
+    groups its strings by length so that only those with a plausible length
+    are ever compared, and compares them with a score cutoff so that
+    dissimilar strings are dismissed early.
+    """
+
+    def __init__(self, strings: Iterable[str] = ()) -> None:
+        self._by_length: dict[int, list[str]] = {}
+        self._lengths: list[int] = []
+        self._exact: set[str] = set()
+        for string in strings:
+            self.add(string)
+
+    def add(self, string: str) -> None:
+        if string in self._exact:
+            return
+        self._exact.add(string)
+        if len(string) not in self._by_length:
+            self._by_length[len(string)] = []
+            self._lengths.insert(bisect_left(self._lengths, len(string)), len(string))
+        self._by_length[len(string)].append(string)
+
+    def find(self, string: str, minimum_similarity: float) -> str | None:
+        """Return any indexed string more similar than the minimum similarity.
+
+        Returns None if no indexed string is strictly more similar to the
+        passed string than `minimum_similarity`.
+        """
+        # no two strings can be more similar than identical ones
+        if minimum_similarity >= 1.0:
+            return None
+        if string in self._exact:
+            return string
+
+        for length in self._candidate_lengths(len(string), minimum_similarity):
+            for candidate in self._by_length[length]:
+                ratio = Levenshtein.ratio(
+                    string, candidate, score_cutoff=minimum_similarity
+                )
+                if ratio > minimum_similarity:
+                    return candidate
+        return None
+
+    def __contains__(self, string: str) -> bool:
+        return string in self._exact
+
+    def _candidate_lengths(self, length: int, minimum_similarity: float) -> list[int]:
+        """Return all indexed lengths which could reach the minimum similarity.
+
+        The bounds are widened by one on either side so that floating point
+        rounding can never exclude a matching string. Lengths closest to the
+        passed length are returned first, since they are the likeliest match.
+        """
+        if minimum_similarity <= 0:
+            lower, upper = 0, math.inf
+        else:
+            lower = length * minimum_similarity / (2 - minimum_similarity) - 1
+            upper = length * (2 - minimum_similarity) / minimum_similarity + 1
+        candidates = self._lengths[
+            bisect_left(self._lengths, lower) : bisect_right(self._lengths, upper)
+        ]
+        return sorted(candidates, key=lambda candidate: abs(candidate - length))
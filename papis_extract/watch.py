@@ -0,0 +1,201 @@
+# pyright: strict, reportMissingTypeStubs=false, reportUnknownMemberType=false
+import os
+import time
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass, field
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Any, Protocol, cast
+
+import papis.logging
+from papis.document import Document
+
+from papis_extract.exceptions import ExportError
+
+logger = papis.logging.get_logger(__name__)
+
+
+class FolderWatcher(Protocol):
+    def wait(self, timeout: float | None) -> set[Path]:
+        """Return the files changed in any of the watched folders.
+
+        Waits for at most `timeout` seconds for the first change, or
+        indefinitely if it is None, and returns an empty set if nothing
+        changed in the meantime.
+        """
+        ...
+
+    def close(self) -> None: ...
+
+
+class InotifyWatcher:
+    """Watch folders through inotify, without using any CPU while waiting."""
+
+    def __init__(self, folders: Iterable[Path]) -> None:
+        from inotify_simple import INotify, flags
+
+        self._inotify = INotify()
+        self._folders: dict[int, Path] = {}
+        mask = flags.CLOSE_WRITE | flags.MOVED_TO
+        try:
+            for folder in folders:
+                try:
+                    self._folders[self._inotify.add_watch(folder, mask)] = folder
+                except FileNotFoundError:
+                    logger.debug(f"Not watching missing folder {folder}.")
+        except OSError:
+            # e.g. too many watched folders, have the caller fall back to polling
+            self._inotify.close()
+            raise
+
+    def wait(self, timeout: float | None) -> set[Path]:
+        # events are (wd, mask, cookie, name) tuples
+        events = cast(
+            "list[tuple[int, int, int, str]]",
+            self._inotify.read(
+                timeout=None if timeout is None else int(timeout * 1000)
+            ),
+        )
+        return {
+            self._folders[wd] / name
+            for wd, _, _, name in events
+            if wd in self._folders and name
+        }
+
+    def close(self) -> None:
+        self._inotify.close()
+
+
+@dataclass
+class PollingWatcher:
+    """Watch folders by regularly comparing the timestamps of their files."""
+
+    folders: list[Path]
+    interval: float = 5.0
+    _files: dict[Path, tuple[int, int]] = field(
+        default_factory=dict[Path, tuple[int, int]]
+    )
+
+    def __post_init__(self) -> None:
+        self._files = self._scan()
+
+    def wait(self, timeout: float | None) -> set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            time.sleep(
+                self.interval if remaining is None else min(self.interval, remaining)
+            )
+            files = self._scan()
+            changed = {
+                path for path, stat in files.items() if self._files.get(path) != stat
+            }
+            self._files = files
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        pass
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        files: dict[Path, tuple[int, int]] = {}
+        for folder in self.folders:
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            files[Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+        return files
+
+
+def make_watcher(folders: Sequence[Path], interval: float) -> FolderWatcher:
+    """Return an inotify watcher if available, or else a polling one."""
+    if find_spec("inotify_simple"):
+        try:
+            return InotifyWatcher(folders)
+        except OSError as e:
+            logger.warning(f"Could not watch folders with inotify, polling: {e}")
+    else:
+        logger.debug("inotify_simple not installed, polling for changes.")
+    return PollingWatcher(list(folders), interval)
+
+
+def watch(
+    documents: Sequence[Document],
+    extract: Callable[[list[Document]], Any],
+    debounce: float = 2.0,
+    interval: float = 5.0,
+) -> None:
+    """Extract all documents, then again whenever one of their files changes.
+
+    Watches the folders of all documents until interrupted, starting before
+    the first extraction so that no change goes unnoticed. Changes are
+    collected until no file changed for `debounce` seconds, so that a burst
+    of writes, e.g. while a file is being synced, only leads to a single
+    extraction of the changed documents.
+    """
+    folders: dict[Path, Document] = {}
+    for doc in documents:
+        folder = doc.get_main_folder()
+        if folder:
+            folders[Path(folder)] = doc
+
+    watcher = make_watcher(list(folders), interval)
+    try:
+        _extract(extract, list(documents))
+        logger.info(f"Watching {len(folders)} documents for changes.")
+        while True:
+            changed = watcher.wait(None)
+            while more := watcher.wait(debounce):
+                changed |= more
+
+            logger.debug(f"Changed files: {', '.join(map(str, sorted(changed)))}")
+            changed_docs = changed_documents(changed, folders)
+            if changed_docs:
+                logger.info(f"Extracting {len(changed_docs)} changed documents.")
+                _extract(extract, changed_docs)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching for changes.")
+    finally:
+        watcher.close()
+
+
+def _extract(extract: Callable[[list[Document]], Any], docs: list[Document]) -> None:
+    # keep watching if some notes could not be written
+    try:
+        extract(docs)
+    except ExportError as e:
+        logger.error(str(e))
+
+
+def changed_documents(
+    changed: Iterable[Path], folders: dict[Path, Document]
+) -> list[Document]:
+    """Return the documents whose files are among the changed ones.
+
+    Documents none of whose known files changed are read from disk again,
+    so that files which were only added to a document while watching are
+    recognized as well. Changes to any other files, like the notes of the
+    documents, are ignored.
+    """
+    by_folder: dict[Path, set[Path]] = {}
+    for path in changed:
+        if path.parent in folders:
+            by_folder.setdefault(path.parent, set()).add(path)
+
+    documents: list[Document] = []
+    for folder, paths in by_folder.items():
+        doc = folders[folder]
+        if not paths & _files(doc):
+            doc.load()
+            if not paths & _files(doc):
+                continue
+        documents.append(doc)
+    return documents
+
+
+def _files(document: Document) -> set[Path]:
+    return {Path(f) for f in document.get_files()}
@@ -0,0 +1,72 @@
+import json
+import tempfile
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import papis.logging
+from papis.document import Document
+
+from papis_extract import cache
+from papis_extract.annotation import Annotation
+
+logger = papis.logging.get_logger(__name__)
+
+
+def default_path(exporter: str = "notes") -> Path:
+    return cache.default_folder() / f"watermarks-{exporter}.json"
+
+
+@dataclass
+class Watermarks:
+    """The newest annotation extracted so far for every document.
+
+    Stores the modification timestamp of the most recently changed
+    annotation of each document, so that later extractions only have
+    to look at annotations created or modified after it.
+
+    Every exporter keeps its own watermarks, see :func:`default_path`, so
+    that e.g. looking at the changes on stdout does not keep them from
+    being written to the notes later on.
+    """
+
+    path: Path = field(default_factory=default_path)
+    marks: dict[str, float] = field(default_factory=dict[str, float])
+
+    def __post_init__(self) -> None:
+        try:
+            self.marks = {
+                str(key): float(value)
+                for key, value in json.loads(self.path.read_text()).items()
+            }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"Could not read extraction watermarks {self.path}: {e}")
+
+    def get(self, document: Document) -> float:
+        key = _key(document)
+        return self.marks.get(key, 0.0) if key else 0.0
+
+    def update(self, document: Document, annotations: Iterable[Annotation]) -> None:
+        """Raise the watermark of the document to its newest annotation."""
+        key = _key(document)
+        newest = max((a.modified for a in annotations), default=0.0)
+        if key and newest > self.marks.get(key, 0.0):
+            self.marks[key] = newest
+
+    def save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.path.parent, delete=False, suffix=".tmp"
+            ) as f:
+                json.dump(self.marks, f)
+            Path(f.name).replace(self.path)
+        except OSError as e:
+            logger.warning(f"Could not save extraction watermarks {self.path}: {e}")
+
+
+def _key(document: Document) -> str | None:
+    """Return a key identifying the document across runs."""
+    return document.get("papis_id") or document.get_main_folder()
@@ -0,0 +1,79 @@
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class BackgroundWriter(Generic[T]):
+    """Run writes on background threads while the caller carries on.
+
+    Meant to hide the latency of reading and writing notes, e.g. on a
+    network-mounted library, behind the extraction of the next documents.
+    Writes with the same key (e.g. the file they write to) always run one
+    after another in the order they were submitted, while writes with
+    different keys run concurrently. Only a limited amount of writes is
+    kept in flight; submitting more waits for the oldest one to finish.
+
+    Failed writes do not stop the others, their errors are collected
+    together with their key instead. With no jobs, everything is written
+    right away on the calling thread.
+    """
+
+    def __init__(self, jobs: int, max_pending: int = 0) -> None:
+        # one single-threaded lane per job, so that writes of a key stay ordered
+        self._lanes = [
+            ThreadPoolExecutor(1, thread_name_prefix="papis-extract-writer")
+            for _ in range(max(jobs, 0))
+        ]
+        self._pending: deque[tuple[str, Future[T]]] = deque()
+        self.max_pending = max_pending or len(self._lanes) * 4
+        self.errors: list[tuple[str, Exception]] = []
+
+    def submit(self, key: str, write: Callable[[], T]) -> list[T]:
+        """Queue the write, returning the results of all writes finished so far.
+
+        Results are returned in the order the writes were submitted.
+        """
+        if not self._lanes:
+            future: Future[T] = Future()
+            try:
+                future.set_result(write())
+            except Exception as e:  # noqa: BLE001 - kept like a failed threaded write
+                future.set_exception(e)
+            self._pending.append((key, future))
+            return self._collect(wait=False)
+
+        lane = self._lanes[hash(key) % len(self._lanes)]
+        self._pending.append((key, lane.submit(write)))
+        results = self._collect(wait=False)
+        while len(self._pending) >= self.max_pending:
+            results += self._collect(wait=True, limit=1)
+        return results
+
+    def flush(self) -> list[T]:
+        """Wait for all queued writes and return their remaining results."""
+        try:
+            return self._collect(wait=True)
+        finally:
+            for lane in self._lanes:
+                lane.shutdown()
+
+    def _collect(self, wait: bool, limit: int = -1) -> list[T]:
+        """Return the results of finished writes from the front of the queue.
+
+        Waits for unfinished writes if requested, up to the limit if given.
+        """
+        results: list[T] = []
+        while self._pending and limit != 0:
+            key, future = self._pending[0]
+            if not wait and not future.done():
+                break
+            self._pending.popleft()
+            limit -= 1
+            try:
+                results.append(future.result())
+            except Exception as e:  # noqa: BLE001 - collected for the caller to report
+                self.errors.append((key, e))
+        return results
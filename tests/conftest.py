@@ -0,0 +1,29 @@
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+from papis.document import Document
+
+
+@pytest.fixture
+def make_document(tmp_path: Path) -> Callable[..., Document]:
+    """Return a function creating saved documents in their own folders.
+
+    Every document lives in a folder of the given name, with the given
+    files written into it as its document files. Any further fields are
+    set on the document, which is titled after its folder unless given.
+    """
+
+    def make(name: str, files: dict[str, str] | None = None, **data: Any) -> Document:
+        folder = tmp_path / name
+        folder.mkdir()
+        for file, content in (files or {}).items():
+            (folder / file).write_text(content)
+        doc = Document(folder=str(folder), data={"title": name, **data})
+        if files:
+            doc["files"] = list(files)
+        doc.save()
+        return doc
+
+    return make
@@ -0,0 +1,223 @@
+import subprocess
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import papis.config
+import papis.document
+import pytest
+
+from papis_extract.annotation import Annotation
+from papis_extract.exceptions import ExportError
+from papis_extract.exporters.notes import NotesExporter
+from papis_extract.formatter import format_markdown, format_markdown_atx
+
+
+@pytest.fixture
+def library(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    for var in ["GIT_AUTHOR", "GIT_COMMITTER"]:
+        monkeypatch.setenv(f"{var}_NAME", "Tester")
+        monkeypatch.setenv(f"{var}_EMAIL", "tester@example.com")
+    monkeypatch.setattr(papis.config, "get_lib_dirs", lambda: [str(tmp_path)])
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    return tmp_path
+
+
+@pytest.fixture
+def batch_size() -> Iterator[Callable[[int], None]]:
+    def set_size(value: int) -> None:
+        papis.config.set("git_batch_size", value, section="plugins.extract")
+
+    yield set_size
+    papis.config.set("git_batch_size", 0, section="plugins.extract")
+
+
+def make_docs(
+    make_document: Callable[..., papis.document.Document], amount: int
+) -> list[tuple[papis.document.Document, list[Annotation]]]:
+    docs: list[tuple[papis.document.Document, list[Annotation]]] = []
+    for i in range(amount):
+        doc = make_document(f"doc{i}", title=f"Title {i}", notes="notes.md")
+        file = Path(doc.get_main_folder() or "", "file.pdf")
+        docs.append((doc, [Annotation(str(file), content=f"quote {i}", tag="t")]))
+    return docs
+
+
+def commits(library: Path) -> list[str]:
+    log = subprocess.run(
+        ["git", "log", "--format=%B%x00"],
+        cwd=library,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [c.strip() for c in log.stdout.split("\0") if c.strip()]
+
+
+def test_commits_all_documents_at_once(
+    library: Path, make_document: Callable[..., papis.document.Document]
+):
+    NotesExporter(formatter=format_markdown, git=True).run(make_docs(make_document, 3))
+
+    log = commits(library)
+    assert len(log) == 1
+    assert log[0].startswith("Update annotations for 3 documents")
+    assert all(f"Title {i}" in log[0] for i in range(3))
+    tracked = subprocess.run(
+        ["git", "ls-files"], cwd=library, capture_output=True, text=True, check=True
+    ).stdout.split()
+    assert "doc0/notes.md" in tracked
+    assert "doc0/info.yaml" in tracked
+    assert "doc0/.notes.md.extracted" in tracked
+
+
+def test_commits_in_batches(
+    library: Path,
+    make_document: Callable[..., papis.document.Document],
+    batch_size: Callable[[int], None],
+):
+    batch_size(2)
+
+    NotesExporter(formatter=format_markdown, git=True).run(make_docs(make_document, 3))
+
+    assert len(commits(library)) == 2
+
+
+def test_no_commit_without_changes(
+    library: Path, make_document: Callable[..., papis.document.Document]
+):
+    docs = make_docs(make_document, 2)
+    sut = NotesExporter(formatter=format_markdown, git=True)
+    sut.run(docs)
+
+    sut.run(docs)
+
+    assert len(commits(library)) == 1
+
+
+def note_doc(
+    make_document: Callable[..., papis.document.Document], text: str
+) -> papis.document.Document:
+    doc = make_document("note", title="Title", notes="notes.md")
+    Path(doc.get_main_folder() or "", "notes.md").write_text(text)
+    return doc
+
+
+def test_reports_failed_notes_after_writing_all_others(
+    library: Path, make_document: Callable[..., papis.document.Document]
+):
+    docs = make_docs(make_document, 3)
+    (library / "doc1" / "notes.md").mkdir()
+
+    with pytest.raises(ExportError, match="1 documents"):
+        NotesExporter(formatter=format_markdown, git=True).run(docs)
+
+    assert "quote 0" in (library / "doc0" / "notes.md").read_text()
+    assert "quote 2" in (library / "doc2" / "notes.md").read_text()
+    assert commits(library)[0].startswith("Update annotations for 2 documents")
+
+
+def test_overwrite_replaces_changed_annotation_in_place(
+    tmp_path: Path, make_document: Callable[..., papis.document.Document]
+):
+    doc = note_doc(
+        make_document,
+        "# Title - \n\n> my lovely quote [p. 3]\n\nMy own thoughts.\n\n"
+        "> another quote [p. 5]\n",
+    )
+    annots = [
+        Annotation("file.pdf", content="my lovely quotes", page=3, tag=""),
+        Annotation("file.pdf", content="a brand new quote", page=9, tag=""),
+    ]
+
+    NotesExporter(formatter=format_markdown_atx, overwrite=True).run([(doc, annots)])
+
+    assert (tmp_path / "note" / "notes.md").read_text() == (
+        "# Title - \n\n> my lovely quotes [p. 3]\n\nMy own thoughts.\n\n"
+        "> another quote [p. 5]\n\n> a brand new quote [p. 9]\n"
+    )
+
+
+def test_overwrite_replaces_notes_written_on_separate_lines(
+    tmp_path: Path, make_document: Callable[..., papis.document.Document]
+):
+    doc = note_doc(
+        make_document, "# Title - \n\n> my quote [p. 3]\n\n  NOTE: thought\n"
+    )
+    annots = [
+        Annotation("file.pdf", content="my quotes", note="thought", page=3, tag="")
+    ]
+
+    NotesExporter(formatter=format_markdown_atx, overwrite=True).run([(doc, annots)])
+
+    assert (tmp_path / "note" / "notes.md").read_text() == (
+        "# Title - \n\n> my quotes [p. 3]\n  NOTE: thought\n"
+    )
+
+
+def test_overwrite_leaves_unchanged_note_alone(
+    tmp_path: Path, make_document: Callable[..., papis.document.Document]
+):
+    doc = note_doc(make_document, "\n# Title - \n\n\n> my quote [p. 3]")
+    note = tmp_path / "note" / "notes.md"
+    mtime = note.stat().st_mtime_ns
+    annots = [Annotation("file.pdf", content="my quote", page=3, tag="")]
+
+    NotesExporter(formatter=format_markdown_atx, overwrite=True).run([(doc, annots)])
+
+    assert note.read_text() == "\n# Title - \n\n\n> my quote [p. 3]"
+    assert note.stat().st_mtime_ns == mtime
+
+
+def test_overwrite_replaces_the_changed_one_of_equally_tagged_annotations(
+    tmp_path: Path,
+    make_document: Callable[..., papis.document.Document],
+):
+    doc = note_doc(make_document, "")
+    first = Annotation("file.pdf", content="first quote here", page=1, tag="important")
+    second = Annotation(
+        "file.pdf", content="second quote there", page=2, tag="important"
+    )
+    NotesExporter(formatter=format_markdown_atx).run([(doc, [first, second])])
+
+    second.content = "second quote there, edited"
+    NotesExporter(formatter=format_markdown_atx, overwrite=True).run(
+        [(doc, [first, second])]
+    )
+
+    assert (tmp_path / "note" / "notes.md").read_text() == (
+        "# Title - \n\n#important\n> first quote here [p. 1]\n\n"
+        "#important\n> second quote there, edited [p. 2]\n"
+    )
+
+
+def test_overwrite_replaces_changed_note_of_annotation(
+    tmp_path: Path, make_document: Callable[..., papis.document.Document]
+):
+    doc = note_doc(make_document, "")
+    annot = Annotation("file.pdf", content="first quote here", note="old thought")
+    annot.page, annot.tag = 1, ""
+    NotesExporter(formatter=format_markdown_atx).run([(doc, [annot])])
+
+    annot.note = "a completely rewritten comment"
+    NotesExporter(formatter=format_markdown_atx, overwrite=True).run([(doc, [annot])])
+
+    assert (tmp_path / "note" / "notes.md").read_text() == (
+        "# Title - \n\n> first quote here [p. 1]\n"
+        "  NOTE: a completely rewritten comment\n"
+    )
+
+
+def test_appends_new_annotations_as_whole_blocks(
+    tmp_path: Path, make_document: Callable[..., papis.document.Document]
+):
+    doc = note_doc(make_document, "# Title - \n\n> my quote [p. 3]\n")
+    annots = [
+        Annotation("file.pdf", content="my quote", note="new thought", page=3, tag=""),
+        Annotation("file.pdf", content="another quote", note="more", page=4, tag=""),
+    ]
+
+    NotesExporter(formatter=format_markdown_atx).run([(doc, annots)])
+
+    assert (tmp_path / "note" / "notes.md").read_text() == (
+        "# Title - \n\n> my quote [p. 3]\n\n> another quote [p. 4]\n  NOTE: more"
+    )
@@ -0,0 +1,63 @@
+# pyright: strict, reportPrivateUsage=false
+import gzip
+import io
+from pathlib import Path
+
+from papis.document import Document
+
+from papis_extract import _open_output
+from papis_extract.annotation import Annotation
+from papis_extract.exporters.stdout import StdoutExporter
+from papis_extract.formatter import (
+    csv_blocks,
+    format_markdown_atx,
+    formatted_blocks,
+    markdown_blocks,
+)
+
+annot_docs = [
+    (Document(data={"title": "first"}), [Annotation("first.pdf", content="one")]),
+    (Document(data={"title": "second"}), [Annotation("second.pdf", content="two")]),
+]
+
+
+def test_separates_documents_with_empty_lines():
+    output = io.StringIO()
+    StdoutExporter(formatter=markdown_blocks, output=output).run(annot_docs)
+
+    assert output.getvalue() == (
+        "=====   \nfirst - \n=====   \n\n> one\n\n"
+        "======   \nsecond - \n======   \n\n> two\n\n"
+    )
+
+
+def test_string_formatters_are_split_into_blocks():
+    output = io.StringIO()
+    StdoutExporter(formatter=format_markdown_atx, output=output).run(annot_docs)
+
+    assert output.getvalue() == "# first - \n\n> one\n\n# second - \n\n> two\n\n"
+    assert list(formatted_blocks(format_markdown_atx, *annot_docs[0])) == [
+        "# first - \n\n",
+        "> one\n\n",
+    ]
+
+
+def test_record_formats_are_written_without_empty_lines():
+    output = io.StringIO()
+    StdoutExporter(formatter=csv_blocks, output=output).run(annot_docs)
+
+    assert output.getvalue().splitlines() == [
+        "type,tag,page,quote,note,author,title,ref,file",
+        "Highlight,,0,one,,,first,,first.pdf",
+        "Highlight,,0,two,,,second,,second.pdf",
+    ]
+
+
+def test_output_files_ending_in_gz_are_compressed(tmp_path: Path):
+    stream = _open_output(tmp_path / "annotations.csv.gz")
+    assert stream
+    StdoutExporter(formatter=csv_blocks, output=stream).run(annot_docs)
+    stream.close()
+
+    with gzip.open(tmp_path / "annotations.csv.gz", "rt") as fr:
+        assert len(fr.read().splitlines()) == 3
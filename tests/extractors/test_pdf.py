@@ -0,0 +1,143 @@
+# pyright: strict, reportMissingTypeStubs=false, reportUnknownMemberType=false, reportPrivateUsage=false
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import cast
+
+import pymupdf as mu
+import pytest
+
+from papis_extract.extractors.pdf import PdfExtractor, parse_pdf_date
+
+TEXT = "Some sentence which is written on page {page} of the document."
+
+
+def make_pdf(path: Path, pages: int, annotated: list[int]) -> Path:
+    with mu.open() as doc:
+        for nr in range(pages):
+            page = doc.new_page()
+            page.insert_text((72, 72), TEXT.format(page=nr))
+            if nr in annotated:
+                highlight = page.add_highlight_annot(
+                    page.search_for("which is written")
+                )
+                highlight.set_colors(stroke=(1.0, 0.0, 0.0))
+                highlight.update()
+                page.add_text_annot((72, 200), f"My note on page {nr}")
+        doc.save(path)
+    return path
+
+
+@pytest.fixture
+def sparse_pdf(tmp_path: Path) -> Path:
+    return make_pdf(tmp_path / "sparse.pdf", pages=50, annotated=[3, 41])
+
+
+def test_can_process_pdf(sparse_pdf: Path):
+    assert PdfExtractor().can_process(sparse_pdf)
+
+
+def test_finds_only_annotated_pages(sparse_pdf: Path):
+    with mu.open(sparse_pdf) as doc:
+        assert PdfExtractor()._annotated_pages(doc) == [3, 41]
+
+
+def test_extracts_highlights_and_notes(sparse_pdf: Path):
+    result = PdfExtractor().run(sparse_pdf)
+
+    assert [(a.page, a.type) for a in result] == [
+        (3, "Highlight"),
+        (3, "Text"),
+        (41, "Highlight"),
+        (41, "Text"),
+    ]
+    assert result[0].content == "which is written"
+    assert result[0].color == (1.0, 0.0, 0.0)
+    assert result[1].note == "My note on page 3"
+    assert len({a.id for a in result}) == len(result)
+
+
+def test_extracts_nothing_from_unannotated_pdf(tmp_path: Path):
+    pdf = make_pdf(tmp_path / "clean.pdf", pages=5, annotated=[])
+
+    assert PdfExtractor().run(pdf) == []
+
+
+def test_multiline_highlight_only_contains_highlighted_words(tmp_path: Path):
+    pdf = tmp_path / "multiline.pdf"
+    with mu.open() as doc:
+        page = doc.new_page()
+        page.insert_text((72, 72), "alpha beta gamma")
+        page.insert_text((72, 90), "delta epsilon zeta")
+        rects = cast("list[mu.Rect]", page.search_for("gamma"))
+        rects += cast("list[mu.Rect]", page.search_for("delta"))
+        page.add_highlight_annot(rects).update()
+        doc.save(pdf)
+
+    result = PdfExtractor().run(pdf)
+
+    assert result[0].content == "gamma delta"
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("D:20240102030405Z", datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+        (
+            "D:20240102030405+02'00'",
+            datetime(2024, 1, 2, 1, 4, 5, tzinfo=timezone.utc),
+        ),
+        ("D:2024", datetime(2024, 1, 1).astimezone()),
+    ],
+)
+def test_parse_pdf_date(value: str, expected: datetime):
+    assert parse_pdf_date(value) == expected.timestamp()
+
+
+def test_parse_invalid_pdf_date():
+    assert parse_pdf_date("") == 0.0
+    assert parse_pdf_date("D:20241399") == 0.0
+
+
+def test_skips_annotations_unchanged_since(tmp_path: Path):
+    pdf = tmp_path / "dated.pdf"
+    with mu.open() as doc:
+        page = doc.new_page()
+        page.insert_text((72, 72), TEXT.format(page=0))
+        for word, date in [
+            ("Some", "D:20200101000000Z"),
+            ("page", "D:20240101000000Z"),
+        ]:
+            annot = page.add_highlight_annot(page.search_for(word))
+            annot.set_info(modDate=date)
+            annot.update()
+        doc.save(pdf)
+    since = datetime(2022, 1, 1, tzinfo=timezone.utc).timestamp()
+
+    result = PdfExtractor().run(pdf, since=since)
+
+    assert [a.content for a in result] == ["page"]
+    assert result[0].modified == datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+    assert result[0].id
+
+
+def test_iter_annotations_stops_at_limits(sparse_pdf: Path):
+    sut = PdfExtractor()
+
+    assert [a.page for a in sut.iter_annotations(sparse_pdf, max_annotations=3)] == [
+        3,
+        3,
+        41,
+    ]
+    assert [a.page for a in sut.iter_annotations(sparse_pdf, max_pages=1)] == [3, 3]
+
+
+def test_iter_annotations_reopens_long_documents(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr("papis_extract.extractors.pdf.REOPEN_PAGES", 2)
+    file = make_pdf(tmp_path / "long.pdf", pages=7, annotated=[0, 2, 3, 5, 6])
+
+    result = list(PdfExtractor().iter_annotations(file))
+
+    assert [a.page for a in result if a.type == "Highlight"] == [0, 2, 3, 5, 6]
+    assert [a.note for a in result if a.type == "Text"][-1] == "My note on page 6"
@@ -38,3 +38,25 @@ def test_entry_extractions():
     ex = ReadEraExtractor()
     result = ex.run(valid_file)
     assert result == expected
+
+
+def test_identifies_exports_larger_than_sniffed_head(tmp_path: Path):
+    content = valid_file.read_text()
+    title, entries = (
+        content[: content.index("\n\n") + 2],
+        content[content.index("\n\n") + 2 :],
+    )
+    large_file = tmp_path / "large_export.txt"
+    large_file.write_text(title + entries * 100)
+
+    ex = ReadEraExtractor()
+
+    assert ex.can_process(large_file)
+    assert len(ex.run(large_file)) == len(expected) * 100
+
+
+def test_ignores_large_plain_text(tmp_path: Path):
+    plain = tmp_path / "ocr_dump.txt"
+    plain.write_text("Title\nAuthor\n" + "some recognized words\n" * 100_000)
+
+    assert not ReadEraExtractor().can_process(plain)
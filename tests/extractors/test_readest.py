@@ -0,0 +1,24 @@
+from pathlib import Path
+
+from papis_extract.extractors.readest import ReadestExtractor
+
+valid_file = Path("tests/resources/Readest_sample.txt")
+invalid_file = Path("tests/resources/ReadEra_sample.txt")
+
+
+def test_identifies_readest_exports():
+    ex = ReadestExtractor()
+    assert ex.can_process(valid_file)
+
+
+def test_ignores_readera_exports():
+    ex = ReadestExtractor()
+    assert not ex.can_process(invalid_file)
+
+
+def test_entry_extractions():
+    ex = ReadestExtractor()
+    result = ex.run(valid_file)
+    assert result[1].content.startswith("As an ideological response")
+    assert result[1].note == "Opposing cynical defeatism to cynical self-interest"
+    assert all(a.file == str(valid_file) for a in result)
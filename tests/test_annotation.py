@@ -1,7 +1,11 @@
+import pickle
+import tracemalloc
+from pathlib import Path
+
 import pytest
 from papis.document import Document
 
-from papis_extract.annotation import Annotation
+from papis_extract.annotation import Annotation, compile_template
 
 
 def test_value_inequality_comparison():
@@ -83,6 +87,14 @@ def test_formatting_document_access(fmt_string: str, expected: str):
     assert sut.format(fmt_string, doc=doc) == expected
 
 
+def test_formatting_compiled_template():
+    sut = Annotation("myfile", content="I am the text value", page=3)
+    template = compile_template("> {{quote}}{{#page}} [p. {{page}}]{{/page}}")
+
+    assert template is compile_template("> {{quote}}{{#page}} [p. {{page}}]{{/page}}")
+    assert sut.format(template) == "> I am the text value [p. 3]"
+
+
 def test_colorname_matches_exact():
     sut = Annotation("testfile", color=(1.0, 0.0, 0.0), minimum_similarity_color=1.0)
     c_name = sut.colorname
@@ -104,3 +116,44 @@ def test_matches_inexact_colorname(color_value: tuple[float, float, float]):
     sut = Annotation("testfile", color=color_value, minimum_similarity_color=0.833)
     c_name = sut.colorname
     assert c_name == "red"
+
+
+def test_annotations_share_file_and_color():
+    filename = Path("/library/doc/file.pdf")
+    one = Annotation(str(filename), color=[1.0, 0.0, 0.0])  # type: ignore
+    other = Annotation(str(filename), color=[1.0, 0.0, 0.0])  # type: ignore
+
+    assert one.file is other.file
+    assert one.color is other.color
+    assert one.color == (1.0, 0.0, 0.0)
+
+
+def test_pickling_roundtrip():
+    sut = Annotation(
+        "myfile", color=(1.0, 0.0, 0.0), content="ct", note="nt", page=3, tag="tg"
+    )
+
+    restored = pickle.loads(pickle.dumps(sut))
+
+    assert restored == sut
+    assert restored.tag == "tg"
+    assert restored.minimum_similarity_color == sut.minimum_similarity_color
+
+
+def test_annotation_memory_footprint():
+    filename = Path("/library/doc/file.pdf")
+    quote = "a quote shared between all annotations"
+    amount = 100_000
+
+    tracemalloc.start()
+    annotations = [
+        Annotation(str(filename), [1.0, 1.0, 0.0], quote, page=i, tag="t")  # type: ignore
+        for i in range(amount)
+    ]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(annotations) == amount
+    # object, list slot and page number, without any per-annotation dict,
+    # file path or color tuple
+    assert retained / amount < 160
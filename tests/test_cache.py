@@ -0,0 +1,106 @@
+import os
+import pickle
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from papis_extract.annotation import Annotation
+from papis_extract.cache import ExtractionCache
+
+
+class StaleAnnotation:
+    """Unpickles like an annotation pickled with a different layout."""
+
+    def __reduce__(self) -> tuple[Any, tuple[Any, ...]]:
+        return (Annotation, tuple(range(20)))
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> Path:
+    fname = tmp_path / "annotated.txt"
+    fname.write_text("some annotated content")
+    return fname
+
+
+def make_cache(tmp_path: Path, **kwargs: Any) -> ExtractionCache:
+    return ExtractionCache(folder=tmp_path / "cache", settings="default", **kwargs)
+
+
+def test_returns_stored_annotations(tmp_path: Path, source: Path):
+    sut = make_cache(tmp_path)
+    annots = [Annotation(str(source), content="my quote", note="my note", page=2)]
+
+    sut.put("MyExtractor", source, annots)
+
+    assert sut.get("MyExtractor", source) == annots
+    assert sut.get("OtherExtractor", source) is None
+
+
+def test_misses_when_file_changed(tmp_path: Path, source: Path):
+    sut = make_cache(tmp_path)
+    sut.put("MyExtractor", source, [Annotation(str(source), content="quote")])
+
+    source.write_text("some changed content!")
+
+    assert sut.get("MyExtractor", source) is None
+
+
+def test_misses_when_settings_changed(tmp_path: Path, source: Path):
+    make_cache(tmp_path).put("MyExtractor", source, [])
+
+    sut = ExtractionCache(folder=tmp_path / "cache", settings="changed")
+
+    assert sut.get("MyExtractor", source) is None
+
+
+@pytest.mark.parametrize(
+    "entry",
+    [
+        b"cno_such_module\nAnnotation\n.",
+        pickle.dumps({"annotations": [StaleAnnotation()]}),
+    ],
+)
+def test_misses_on_stale_entries(tmp_path: Path, source: Path, entry: bytes):
+    sut = make_cache(tmp_path)
+    sut.put("MyExtractor", source, [Annotation(str(source), content="my quote")])
+    for path in (tmp_path / "cache").glob("*.pickle"):
+        path.write_bytes(entry)
+
+    assert sut.get("MyExtractor", source) is None
+
+
+def test_content_hash_survives_touched_file(tmp_path: Path, source: Path):
+    sut = make_cache(tmp_path, hash_content=True)
+    sut.put("MyExtractor", source, [Annotation(str(source), content="quote")])
+
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000_000))
+
+    assert sut.get("MyExtractor", source) == [Annotation(str(source), content="quote")]
+
+
+def test_refresh_ignores_existing_entries(tmp_path: Path, source: Path):
+    make_cache(tmp_path).put("MyExtractor", source, [])
+
+    assert make_cache(tmp_path, refresh=True).get("MyExtractor", source) is None
+
+
+def test_evicts_least_recently_used_entries(tmp_path: Path):
+    sut = make_cache(tmp_path, max_size=0)
+    files: list[Path] = []
+    for i in range(3):
+        fname = tmp_path / f"file{i}.txt"
+        fname.write_text(str(i))
+        sut.put("MyExtractor", fname, [Annotation(str(fname), content="x" * 100)])
+        files.append(fname)
+    entry_size = next((tmp_path / "cache").iterdir()).stat().st_size
+    sut.max_size = entry_size * 2
+    for i, entry in enumerate(sorted((tmp_path / "cache").iterdir())):
+        os.utime(entry, (i, i))
+    sut.get("MyExtractor", files[0])  # most recently used now
+
+    sut.evict()
+
+    assert len(list((tmp_path / "cache").iterdir())) == 2
+    assert sut.get("MyExtractor", files[0]) is not None
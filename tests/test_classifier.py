@@ -0,0 +1,43 @@
+from pathlib import Path
+
+import pytest
+
+from papis_extract.classifier import HEAD_SIZE, classify
+
+
+@pytest.mark.parametrize(
+    "name,content,kind",
+    [
+        ("doc.pdf", b"%PDF-1.7\n%binary", "pdf"),
+        ("no-extension", b"%PDF-1.4\n\x00\x01", "pdf"),
+        ("export.html", b"<html><head></head></html>", "html"),
+        ("annotations.txt", b"My Book\nMy Author\n\n*****\n", "text"),
+        ("image.png", b"\x89PNG\r\n\x1a\n\x00\x00", "binary"),
+    ],
+)
+def test_classifies_file_kinds(tmp_path: Path, name: str, content: bytes, kind: str):
+    fname = tmp_path / name
+    fname.write_bytes(content)
+
+    assert classify(fname).kind == kind
+
+
+def test_reads_bounded_head_and_tail(tmp_path: Path):
+    fname = tmp_path / "large.txt"
+    fname.write_bytes(b"a" * HEAD_SIZE * 4 + b"THE END\n")
+
+    info = classify(fname)
+
+    assert len(info.head) == HEAD_SIZE
+    assert not info.complete
+    assert info.tail.endswith(b"THE END\n")
+
+
+def test_reclassifies_changed_files(tmp_path: Path):
+    fname = tmp_path / "changing.txt"
+    fname.write_bytes(b"plain text")
+    assert classify(fname).kind == "text"
+
+    fname.write_bytes(b"%PDF-1.7 and now much longer")
+
+    assert classify(fname).kind == "pdf"
@@ -0,0 +1,73 @@
+import random
+from collections.abc import Callable, Iterator
+
+import papis.config
+import pytest
+
+from papis_extract import colors
+from papis_extract.annotation import Annotation
+from papis_extract.colors import COLORS, Palette, get_palette
+
+
+@pytest.fixture
+def tags_config() -> Iterator[Callable[[str], None]]:
+    def set_tags(value: str) -> None:
+        papis.config.set("tags", value, section="plugins.extract")
+
+    yield set_tags
+    papis.config.set("tags", "{}", section="plugins.extract")
+
+
+def test_palette_remembers_classified_colors():
+    sut = Palette(COLORS, {"red": "important"})
+
+    assert sut.tag((0.9, 0.0, 0.0)) == "important"
+    sut.colors = {}
+    assert sut.tag((0.9, 0.0, 0.0)) == "important"
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_batch_classification_matches_single(
+    monkeypatch: pytest.MonkeyPatch, numpy: bool
+):
+    monkeypatch.setattr(colors, "HAS_NUMPY", numpy)
+    rng = random.Random(42)
+    sample = [(rng.random(), rng.random(), rng.random()) for _ in range(500)]
+    sample += list(COLORS.values())
+
+    batch = Palette(COLORS, {}, 0.75).classify(sample)
+
+    monkeypatch.setattr(colors, "HAS_NUMPY", False)
+    single = Palette(COLORS, {}, 0.75)
+    assert batch == [single.colorname(c) for c in sample]
+
+
+def test_custom_tag_colors(tags_config: Callable[[str], None]):
+    tags_config('{"red": "important", "followup": (0.2, 0.4, 1.0)}')
+
+    palette = get_palette()
+
+    assert palette.tag((1.0, 0.0, 0.0)) == "important"
+    assert palette.tag((0.2, 0.4, 1.0)) == "followup"
+
+
+def test_palette_reparsed_only_on_config_change(tags_config: Callable[[str], None]):
+    tags_config('{"red": "important"}')
+    assert get_palette() is get_palette()
+
+    tags_config('{"red": "urgent"}')
+    assert get_palette().tag((1.0, 0.0, 0.0)) == "urgent"
+
+
+def test_tag_annotations_in_batch(tags_config: Callable[[str], None]):
+    tags_config('{"red": "important", "blue": "toread"}')
+    annotations = [
+        Annotation("file", color=(1.0, 0.0, 0.0)),
+        Annotation("file", color=(0.0, 0.0, 0.9)),
+        Annotation("file", color=(1.0, 0.0, 0.0), tag="given"),
+        Annotation("file", color=(0.5, 0.5, 0.5)),
+    ]
+
+    Annotation.tag_annotations(annotations)
+
+    assert [a.tag for a in annotations] == ["important", "toread", "given", ""]
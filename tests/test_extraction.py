@@ -0,0 +1,116 @@
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+from papis.document import Document
+
+from papis_extract import extraction, profiling
+from papis_extract.annotation import Annotation
+
+
+class LineExtractor:
+    """Turns every line of a '.txt' file into an annotation."""
+
+    file_types = frozenset({"text"})
+
+    def __init__(self) -> None:
+        self.processed: list[Path] = []
+
+    def can_process(self, filename: Path) -> bool:
+        return filename.suffix == ".txt"
+
+    def run(self, filename: Path, since: float = 0.0) -> list[Annotation]:
+        self.processed.append(filename)
+        return [
+            Annotation(str(filename), content=line, page=i + 1)
+            for i, line in enumerate(filename.read_text().splitlines())
+        ]
+
+
+def make_documents(
+    make_document: Callable[..., Document], amount: int
+) -> list[Document]:
+    return [
+        make_document(f"doc{i}", {"annots.txt": f"first of {i}\nsecond of {i}\n"})
+        for i in range(amount)
+    ]
+
+
+def test_start_document_without_processable_files(
+    make_document: Callable[..., Document],
+):
+    doc = make_documents(make_document, 1)[0]
+    doc["files"] = []
+    assert extraction.start_document(doc, [LineExtractor()]) is None
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_start_all_keeps_document_order(
+    make_document: Callable[..., Document], jobs: int
+):
+    documents = make_documents(make_document, 10)
+
+    result = list(extraction.start_all(documents, [LineExtractor()], jobs=jobs))
+
+    assert [doc["title"] for doc, _ in result] == [f"doc{i}" for i in range(10)]
+    for i, (_, annots) in enumerate(result):
+        assert [a.content for a in annots] == [f"first of {i}", f"second of {i}"]
+
+
+def test_start_all_extracts_lazily(make_document: Callable[..., Document]):
+    documents = make_documents(make_document, 3)
+    extractor = LineExtractor()
+
+    result = extraction.start_all(documents, [extractor])
+    assert extractor.processed == []
+
+    doc, _ = next(result)
+    assert doc["title"] == "doc0"
+    assert len(extractor.processed) == 1
+
+
+def test_start_document_dispatches_by_file_kind(
+    tmp_path: Path, make_document: Callable[..., Document]
+):
+    doc = make_documents(make_document, 1)[0]
+    (tmp_path / "doc0" / "binary.txt").write_bytes(b"\x00\x01\x02")
+    doc["files"] = ["annots.txt", "binary.txt"]
+    extractor = LineExtractor()
+
+    extraction.start_document(doc, [extractor])
+
+    assert extractor.processed == [tmp_path / "doc0" / "annots.txt"]
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_start_all_skips_files_unchanged_since(
+    make_document: Callable[..., Document], jobs: int
+):
+    documents = make_documents(make_document, 4)
+    for i, doc in enumerate(documents):
+        os.utime(Path(doc.get_main_folder() or "", "annots.txt"), (1000 * i, 1000 * i))
+
+    result = list(
+        extraction.start_all(
+            documents, [LineExtractor()], jobs=jobs, since=lambda _: 1500.0
+        )
+    )
+
+    assert [len(annots) for _, annots in result] == [0, 0, 2, 2]
+    assert all(a.modified == 2000.0 for a in result[2][1])
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_start_all_collects_timings_of_all_jobs(
+    make_document: Callable[..., Document], jobs: int
+):
+    documents = make_documents(make_document, 4)
+    profile = profiling.enable()
+    try:
+        list(extraction.start_all(documents, [LineExtractor()], jobs=jobs))
+    finally:
+        profiling.disable()
+
+    assert profile.stages()["extract.LineExtractor"]["count"] == 4
+    assert len(profile.slowest("document")) == 4
@@ -1,12 +1,20 @@
+import csv
+import io
+import json
+
 from papis.document import Document
 
 from papis_extract.annotation import Annotation
 from papis_extract.formatter import (
+    csv_blocks,
     format_count,
     format_csv,
+    format_jsonl,
     format_markdown,
     format_markdown_atx,
     format_markdown_setext,
+    markdown_blocks,
+    template_blocks,
 )
 
 document = Document(data={"author": "document-author", "title": "document-title"})
@@ -46,6 +54,23 @@ def test_markdown_setext():
     assert fmt(document, annotations) == md_default_output
 
 
+def test_markdown_blocks_per_annotation():
+    blocks = list(markdown_blocks(document, annotations, headings="atx"))
+
+    assert blocks == [
+        "# document-title - document-author\n\n",
+        "> my lovely text\n\n",
+        "> my second text\n  NOTE: with note\n\n",
+    ]
+
+
+def test_csv_blocks_per_row():
+    blocks = list(csv_blocks(document, annotations, first=True))
+
+    assert len(blocks) == 3
+    assert all(block.endswith("\n") and block.count("\n") == 1 for block in blocks)
+
+
 def test_count_default():
     fmt = format_count
     assert fmt(document, annotations) == ("""2 document-author: document-title""")
@@ -54,10 +79,9 @@ def test_count_default():
 def test_csv_default():
     fmt = format_csv
     assert fmt(document, annotations) == (
-        'Highlight,,0,"my lovely text","","document-author",'
-        '"document-title","","myfile.pdf"\n'
-        'Highlight,,0,"my second text","with note","document-author",'
-        '"document-title","","myfile.pdf"'
+        "Highlight,,0,my lovely text,,document-author,document-title,,myfile.pdf\n"
+        "Highlight,,0,my second text,with note,document-author,document-title,,"
+        "myfile.pdf"
     )
 
 
@@ -65,13 +89,39 @@ def test_csv_with_header():
     fmt = format_csv
     assert fmt(document, annotations, first=True) == (
         "type,tag,page,quote,note,author,title,ref,file\n"
-        'Highlight,,0,"my lovely text","","document-author",'
-        '"document-title","","myfile.pdf"\n'
-        'Highlight,,0,"my second text","with note","document-author",'
-        '"document-title","","myfile.pdf"'
+        "Highlight,,0,my lovely text,,document-author,document-title,,myfile.pdf\n"
+        "Highlight,,0,my second text,with note,document-author,document-title,,"
+        "myfile.pdf"
     )
 
 
+def test_csv_escapes_quotes_and_line_breaks():
+    annots = [Annotation("my, file.pdf", content='a "quoted"\ntext', note="a, b")]
+    output = format_csv(document, annots, first=True)
+
+    rows = list(csv.reader(io.StringIO(output)))
+    assert rows[1][3:5] == ['a "quoted"\ntext', "a, b"]
+    assert rows[1][8] == "my, file.pdf"
+
+
+def test_jsonl_default():
+    lines = format_jsonl(document, annotations).split("\n")
+
+    assert len(lines) == 2
+    assert json.loads(lines[1]) == {
+        "ref": "",
+        "author": "document-author",
+        "title": "document-title",
+        "file": "myfile.pdf",
+        "page": 0,
+        "type": "Highlight",
+        "tag": "",
+        "color": [0.0, 0.0, 0.0],
+        "quote": "my second text",
+        "note": "with note",
+    }
+
+
 # sadpath - no annotations contained for each format
 def test_markdown_no_annotations():
     assert format_markdown(document, []) == ""
@@ -83,3 +133,19 @@ def test_count_no_annotations():
 
 def test_csv_no_annotations():
     assert format_csv(document, []) == ""
+
+
+def test_jsonl_no_annotations():
+    assert format_jsonl(document, []) == ""
+
+
+def test_template_blocks():
+    template = "{{quote}} ({{doc.author}}){{#note}}: {{note}}{{/note}}"
+    assert list(template_blocks(template, document, annotations)) == [
+        "my lovely text (document-author)\n\n",
+        "my second text (document-author): with note\n\n",
+    ]
+
+
+def test_template_blocks_no_annotations():
+    assert list(template_blocks("{{quote}}", document, [])) == []
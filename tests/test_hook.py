@@ -0,0 +1,131 @@
+import sys
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import papis.api
+import papis.config
+import papis.document
+import pytest
+
+import papis_extract
+from papis_extract.annotation import Annotation
+from papis_extract.cache import ExtractionCache
+
+
+@pytest.fixture
+def on_import(monkeypatch: pytest.MonkeyPatch) -> Iterator[Callable[[bool], None]]:
+    def set_on_import(value: bool) -> None:
+        papis.config.set("on_import", value, section="plugins.extract")
+
+    # the new document is not part of the database yet
+    def no_database(doc: papis.document.Document) -> None:
+        raise AssertionError("database must not be touched")
+
+    monkeypatch.setattr(papis.api, "save_doc", no_database)
+    papis.config.set("cache", False, section="plugins.extract")
+    yield set_on_import
+    papis.config.set("on_import", False, section="plugins.extract")
+    papis.config.set("cache", True, section="plugins.extract")
+
+
+def new_document(
+    make_document: Callable[..., papis.document.Document],
+) -> papis.document.Document:
+    return make_document(
+        "book",
+        {"readera.txt": Path("tests/resources/ReadEra_sample.txt").read_text()},
+        title="The Book",
+        author="Some Author",
+    )
+
+
+def test_extracts_new_document_into_note(
+    tmp_path: Path,
+    on_import: Callable[[bool], None],
+    make_document: Callable[..., papis.document.Document],
+):
+    on_import(True)
+    doc = new_document(make_document)
+
+    papis_extract.on_add_done(doc)
+
+    note = tmp_path / "book" / doc["notes"]
+    assert note.read_text().startswith("# The Book - Some Author")
+    assert "outsourced labor" in note.read_text()
+    assert papis.document.from_folder(str(tmp_path / "book"))["notes"] == doc["notes"]
+
+
+def test_does_nothing_unless_enabled(
+    tmp_path: Path,
+    on_import: Callable[[bool], None],
+    make_document: Callable[..., papis.document.Document],
+):
+    on_import(False)
+    doc = new_document(make_document)
+
+    papis_extract.on_add_done(doc)
+
+    assert "notes" not in doc
+    assert sorted(p.name for p in (tmp_path / "book").iterdir()) == [
+        "info.yaml",
+        "readera.txt",
+    ]
+
+
+def test_only_loads_extractors_for_document_files(
+    on_import: Callable[[bool], None],
+    make_document: Callable[..., papis.document.Document],
+):
+    on_import(True)
+    doc = new_document(make_document)
+    sys.modules.pop("papis_extract.extractors.pocketbook", None)
+
+    papis_extract.on_add_done(doc)
+
+    assert "papis_extract.extractors.pocketbook" not in sys.modules
+
+
+def test_writes_note_with_formatter_configured_after_import(
+    tmp_path: Path,
+    on_import: Callable[[bool], None],
+    make_document: Callable[..., papis.document.Document],
+):
+    on_import(True)
+    papis.config.set(
+        "formatters", "{'quotes': '- {{quote}}'}", section="plugins.extract"
+    )
+    papis.config.set("on_import_formatter", "quotes", section="plugins.extract")
+    doc = new_document(make_document)
+    try:
+        papis_extract.on_add_done(doc)
+    finally:
+        papis.config.set("formatters", "{}", section="plugins.extract")
+        papis.config.set(
+            "on_import_formatter", "markdown-atx", section="plugins.extract"
+        )
+
+    assert (tmp_path / "book" / doc["notes"]).read_text().startswith("- ")
+
+
+def test_does_not_cache_files_of_new_document(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    on_import: Callable[[bool], None],
+    make_document: Callable[..., papis.document.Document],
+):
+    cached: list[Path] = []
+
+    def put(
+        self: ExtractionCache, extractor: str, filename: Path, annots: list[Annotation]
+    ) -> None:
+        cached.append(filename)
+
+    on_import(True)
+    papis.config.set("cache", True, section="plugins.extract")
+    monkeypatch.setattr(ExtractionCache, "put", put)
+    doc = new_document(make_document)
+
+    papis_extract.on_add_done(doc)
+
+    assert (tmp_path / "book" / doc["notes"]).exists()
+    assert cached == []
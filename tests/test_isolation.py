@@ -0,0 +1,116 @@
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from papis.document import Document
+
+from papis_extract import extraction, run
+from papis_extract.annotation import Annotation
+from papis_extract.exceptions import ExtractionAborted, ExtractionError
+from papis_extract.isolation import Isolation, SkipList
+
+
+class BehavingExtractor:
+    """Behaves as written in the text file it extracts from."""
+
+    file_types = frozenset({"text"})
+
+    def can_process(self, filename: Path) -> bool:
+        return filename.suffix == ".txt"
+
+    def run(self, filename: Path, since: float = 0.0) -> list[Annotation]:
+        behaviour = filename.read_text().strip()
+        if behaviour == "hang":
+            time.sleep(60)
+        elif behaviour == "crash":
+            os.kill(os.getpid(), signal.SIGKILL)
+        elif behaviour == "hog":
+            _ = bytearray(2 * 1024 * 1024 * 1024)
+        elif behaviour == "fail":
+            raise ExtractionError("damaged")
+        return [Annotation(str(filename), content=behaviour * 10_000)]
+
+
+@pytest.fixture
+def isolation(tmp_path: Path) -> Isolation:
+    return Isolation(timeout=1.0, memory=256 * 1024 * 1024, skipped=SkipList(tmp_path))
+
+
+def write(tmp_path: Path, behaviour: str) -> Path:
+    file = tmp_path / f"{behaviour}.txt"
+    file.write_text(behaviour)
+    return file
+
+
+def test_returns_annotations_of_isolated_extraction(
+    tmp_path: Path, isolation: Isolation
+):
+    result = isolation.run(BehavingExtractor(), write(tmp_path, "fine"))
+
+    # large enough to not fit into the pipe buffer at once
+    assert [a.content for a in result] == ["fine" * 10_000]
+
+
+@pytest.mark.parametrize(
+    "behaviour, reason",
+    [
+        ("hang", "timed out after 1 seconds"),
+        ("crash", "crashed with signal 9"),
+        ("hog", "ran out of memory"),
+    ],
+)
+def test_aborts_pathological_extraction(
+    tmp_path: Path, isolation: Isolation, behaviour: str, reason: str
+):
+    with pytest.raises(ExtractionAborted, match=reason):
+        isolation.run(BehavingExtractor(), write(tmp_path, behaviour))
+
+
+def test_passes_on_extraction_errors(tmp_path: Path, isolation: Isolation):
+    with pytest.raises(ExtractionError, match="damaged"):
+        isolation.run(BehavingExtractor(), write(tmp_path, "fail"))
+
+
+def test_skips_aborted_files_until_they_change(tmp_path: Path, isolation: Isolation):
+    file = write(tmp_path, "crash")
+    doc = Document(folder=str(tmp_path), data={"files": [file.name]})
+    extractor = BehavingExtractor()
+
+    assert extraction.start(extractor, doc, isolation=isolation) == []
+    assert isolation.skipped.reason("BehavingExtractor", file)
+
+    file.write_text("fine now")
+    result = extraction.start(extractor, doc, isolation=isolation)
+
+    assert result is not None
+    assert result[0].content.startswith("fine now")
+    assert isolation.skipped.reason("BehavingExtractor", file) is None
+
+
+def test_forks_without_writer_threads_running(
+    tmp_path: Path, isolation: Isolation, monkeypatch: pytest.MonkeyPatch
+):
+    threads: list[int] = []
+    fork = os.fork
+
+    def counting_fork() -> int:
+        threads.append(threading.active_count())
+        return fork()
+
+    monkeypatch.setattr(os, "fork", counting_fork)
+    docs: list[Document] = []
+    for i in range(3):
+        folder = tmp_path / f"doc{i}"
+        folder.mkdir()
+        write(folder, "fine")
+        doc = Document(data={"files": ["fine.txt"], "notes": "notes.md"})
+        doc.set_folder(str(folder))
+        docs.append(doc)
+
+    run(docs, None, [BehavingExtractor()], write=True, isolation=isolation)
+
+    assert threads == [1, 1, 1]
+    assert all((tmp_path / f"doc{i}" / "notes.md").exists() for i in range(3))
@@ -0,0 +1,95 @@
+from pathlib import Path
+
+import papis.document
+import pytest
+
+from papis_extract.annotation import Annotation
+from papis_extract.exporters.notes import NotesExporter
+from papis_extract.formatter import format_markdown
+from papis_extract.ledger import Ledger, fingerprint
+
+
+@pytest.fixture
+def document(tmp_path: Path) -> papis.document.Document:
+    doc = papis.document.from_data({"title": "Title", "notes": "notes.md"})
+    doc.set_folder(str(tmp_path))
+    return doc
+
+
+def annotations(*quotes: str) -> list[Annotation]:
+    return [
+        Annotation("/lib/doc/file.pdf", content=q, page=i, tag="t")
+        for i, q in enumerate(quotes, 1)
+    ]
+
+
+def test_fingerprint_ignores_case_whitespace_and_folder():
+    one = Annotation("/lib/doc/file.pdf", content="Some  quote\n", page=3)
+    two = Annotation("/moved/doc/file.pdf", content="some quote", page=3)
+    other_page = Annotation("/lib/doc/file.pdf", content="some quote", page=4)
+
+    assert fingerprint(one) == fingerprint(two)
+    assert fingerprint(one) != fingerprint(other_page)
+
+
+def test_ledger_roundtrip(tmp_path: Path):
+    note = tmp_path / "notes.md"
+    note.write_text("content")
+    sut = Ledger(note)
+    sut.record(annotations("one", "two"))
+    sut.save()
+    sut = Ledger(note)
+    sut.record(annotations("one", "two", "three"))
+    sut.save()
+
+    ledger = Ledger(note)
+
+    assert len(ledger) == 3
+    assert (
+        ledger.unexported(annotations("one", "two", "three", "four"))
+        == (annotations("one", "two", "three", "four")[3:])
+    )
+
+
+def test_ledger_ignored_for_emptied_note(tmp_path: Path):
+    note = tmp_path / "notes.md"
+    note.write_text("content")
+    sut = Ledger(note)
+    sut.record(annotations("one"))
+    sut.save()
+
+    note.write_text("")
+
+    assert len(Ledger(note)) == 0
+
+
+def test_exported_annotations_are_not_compared_again(
+    document: papis.document.Document, monkeypatch: pytest.MonkeyPatch
+):
+    sut = NotesExporter(formatter=format_markdown)
+    sut.run([(document, annotations("first quote"))])
+    compared: list[list[str]] = []
+
+    def drop_existing(annots: list[str], lines: list[str]) -> list[str]:
+        compared.append(annots)
+        return annots
+
+    monkeypatch.setattr(sut, "_drop_existing_annotations", drop_existing)
+
+    sut.run([(document, annotations("first quote", "second quote"))])
+
+    note = Path(document.get_main_folder() or "", "notes.md").read_text()
+    assert note.count("first quote") == 1
+    assert note.count("second quote") == 1
+    assert all("first quote" not in line for annots in compared for line in annots)
+
+
+def test_exports_again_into_emptied_note(document: papis.document.Document):
+    sut = NotesExporter(formatter=format_markdown)
+    sut.run([(document, annotations("first quote"))])
+    note = Path(document.get_main_folder() or "", "notes.md")
+    note.write_text("")
+
+    sut.run([(document, annotations("first quote"))])
+
+    assert note.read_text().count("first quote") == 1
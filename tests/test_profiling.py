@@ -0,0 +1,34 @@
+from collections.abc import Iterator
+
+import pytest
+from papis.document import Document
+
+from papis_extract import profiling
+
+
+@pytest.fixture
+def profile() -> Iterator[profiling.Profile]:
+    yield profiling.enable()
+    profiling.disable()
+
+
+def test_nothing_recorded_when_disabled():
+    with profiling.timed("stage", Document(data={"title": "t"})):
+        pass
+
+    assert profiling.current() is None
+    assert profiling.drain() == []
+
+
+def test_records_stages_per_document_and_file(profile: profiling.Profile):
+    doc = Document(data={"title": "My Title", "author": "Me"})
+    for file in ["a.pdf", "b.pdf"]:
+        with profiling.timed("extract", doc, file):
+            pass
+    with profiling.timed("query"):
+        pass
+
+    assert profile.stages()["extract"]["count"] == 2
+    assert [key for key, _ in profile.slowest("document")] == ["My Title - Me"]
+    assert {key for key, _ in profile.slowest("file")} == {"a.pdf", "b.pdf"}
+    assert "slowest files:" in profile.summary()
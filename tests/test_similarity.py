@@ -0,0 +1,41 @@
+import random
+import string
+
+import Levenshtein
+import pytest
+
+from papis_extract.similarity import SimilarityIndex
+
+
+def brute_force(query: str, lines: list[str], minimum_similarity: float) -> bool:
+    return any(Levenshtein.ratio(query, line) > minimum_similarity for line in lines)
+
+
+def random_line(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase[:6] + " ", k=rng.randint(0, 40)))
+
+
+@pytest.mark.parametrize("minimum_similarity", [0.0, 0.5, 0.75, 0.9, 1.0])
+def test_matches_brute_force_comparison(minimum_similarity: float):
+    rng = random.Random(1)
+    lines = [random_line(rng) for _ in range(300)]
+    queries = [random_line(rng) for _ in range(300)] + lines[:20]
+
+    sut = SimilarityIndex(lines)
+
+    for query in queries:
+        found = sut.find(query, minimum_similarity)
+        assert (found is not None) == brute_force(query, lines, minimum_similarity)
+        if found is not None:
+            assert Levenshtein.ratio(query, found) > minimum_similarity
+
+
+def test_finds_slightly_changed_line():
+    sut = SimilarityIndex(["> my lovely text [p. 3]\n", "> something else\n"])
+
+    assert sut.find("> my lovely txt [p. 3]", 0.75) == "> my lovely text [p. 3]\n"
+    assert sut.find("> an entirely different quote", 0.75) is None
+
+
+def test_empty_index():
+    assert SimilarityIndex().find("anything", 0.5) is None
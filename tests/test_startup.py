@@ -0,0 +1,90 @@
+# pyright: strict, reportPrivateUsage=false
+import subprocess
+import sys
+
+import pytest
+
+from papis_extract.registry import LazyRegistry
+
+# only imported once an extractor, exporter or template is actually used
+DEFERRED_MODULES = [
+    "pymupdf",
+    "bs4",
+    "magic",
+    "chevron",
+    "Levenshtein",
+    "papis.notes",
+    "papis.commands.edit",
+    "papis_extract.extractors.pdf",
+    "papis_extract.exporters.notes",
+]
+
+
+def _importtime(statement: str) -> dict[str, int]:
+    """Return the cumulative import time in us of every imported module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def test_import_defers_heavy_dependencies():
+    modules = _importtime("import papis_extract")
+
+    assert "papis_extract" in modules
+    assert [m for m in DEFERRED_MODULES if m in modules] == []
+
+
+def test_import_does_not_read_custom_formatters():
+    statement = """
+import papis.config
+read = []
+get = papis.config.general_get
+papis.config.general_get = lambda key, *args, **kwargs: (
+    read.append(key) or get(key, *args, **kwargs)
+)
+import papis_extract
+assert "formatters" not in read, read
+"""
+    subprocess.run([sys.executable, "-c", statement], check=True)
+
+
+def test_using_an_extractor_imports_its_dependencies():
+    modules = _importtime(
+        "from papis_extract.extractors import all_extractors; all_extractors['pdf']"
+    )
+
+    assert "pymupdf" in modules
+    assert "bs4" not in modules
+
+
+def test_registry_creates_entries_once_on_first_use():
+    created: list[str] = []
+    sut: LazyRegistry[object] = LazyRegistry()
+    sut.register("a", lambda: created.append("a") or object())
+    sut["b"] = "set directly"
+
+    assert list(sut) == ["a", "b"]
+    assert created == []
+    assert sut["a"] is sut.get("a")
+    assert created == ["a"]
+    assert sut["b"] == "set directly"
+    with pytest.raises(KeyError):
+        sut["c"]
+
+
+def test_registered_file_types_match_extractors():
+    from papis_extract.extractors import _file_types, all_extractors
+
+    assert {name: all_extractors[name].file_types for name in _file_types} == (
+        _file_types
+    )
@@ -0,0 +1,98 @@
+from collections.abc import Callable, Sequence
+from pathlib import Path
+
+import pytest
+from papis.document import Document
+
+from papis_extract import watch
+from papis_extract.watch import PollingWatcher, changed_documents
+
+
+def test_only_documents_with_changed_files_are_extracted(
+    tmp_path: Path, make_document: Callable[..., Document]
+):
+    first = make_document("first", {"book.pdf": "annotations"})
+    second = make_document("second", {"book.pdf": "annotations"})
+    folders = {tmp_path / "first": first, tmp_path / "second": second}
+
+    result = changed_documents(
+        [tmp_path / "first" / "book.pdf", tmp_path / "second" / "notes.md"], folders
+    )
+
+    assert result == [first]
+
+
+def test_files_added_to_document_while_watching_are_recognized(
+    tmp_path: Path, make_document: Callable[..., Document]
+):
+    doc = make_document("doc", {"book.pdf": "annotations"})
+    (tmp_path / "doc" / "export.txt").write_text("annotations")
+    Document(
+        folder=str(tmp_path / "doc"), data={**doc, "files": ["book.pdf", "export.txt"]}
+    ).save()
+
+    result = changed_documents(
+        [tmp_path / "doc" / "export.txt"], {tmp_path / "doc": doc}
+    )
+
+    assert result == [doc]
+    assert len(doc.get_files()) == 2
+
+
+def test_polling_watcher_finds_changed_files(
+    tmp_path: Path, make_document: Callable[..., Document]
+):
+    make_document("doc", {"book.pdf": "annotations"})
+    sut = PollingWatcher([tmp_path / "doc"], interval=0.01)
+
+    assert sut.wait(0.05) == set()
+    (tmp_path / "doc" / "book.pdf").write_text("more annotations")
+    assert sut.wait(0.05) == {tmp_path / "doc" / "book.pdf"}
+
+
+def test_inotify_watcher_finds_changed_files(
+    tmp_path: Path, make_document: Callable[..., Document]
+):
+    pytest.importorskip("inotify_simple")
+    make_document("doc", {"book.pdf": "annotations"})
+    sut = watch.InotifyWatcher([tmp_path / "doc"])
+
+    (tmp_path / "doc" / "book.pdf").write_text("more annotations")
+
+    assert sut.wait(1.0) == {tmp_path / "doc" / "book.pdf"}
+    assert sut.wait(0.01) == set()
+    sut.close()
+
+
+class ScriptedWatcher:
+    def __init__(self, changes: list[set[Path]]) -> None:
+        self.changes = changes
+
+    def wait(self, timeout: float | None) -> set[Path]:
+        if not self.changes:
+            raise KeyboardInterrupt
+        return self.changes.pop(0)
+
+    def close(self) -> None:
+        pass
+
+
+def test_watch_extracts_bursts_of_changes_once(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    make_document: Callable[..., Document],
+):
+    doc = make_document("doc", {"book.pdf": "annotations"})
+    book = tmp_path / "doc" / "book.pdf"
+    scripted = ScriptedWatcher([{book}, {book}, {book}, set(), {book}, set()])
+
+    def make_watcher(folders: Sequence[Path], interval: float) -> ScriptedWatcher:
+        return scripted
+
+    monkeypatch.setattr(watch, "make_watcher", make_watcher)
+    extracted: list[list[Document]] = []
+
+    watch.watch([doc], extracted.append)
+
+    # everything once at the start, then once per burst
+    assert extracted == [[doc], [doc], [doc]]
@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import papis.document
+import pytest
+from papis.document import Document
+
+from papis_extract import cache, run
+from papis_extract.annotation import Annotation
+from papis_extract.watermarks import Watermarks
+
+
+class StampedExtractor:
+    """Turns every line of a '.txt' file into an annotation modified at 100."""
+
+    file_types = frozenset({"text"})
+
+    def can_process(self, filename: Path) -> bool:
+        return filename.suffix == ".txt"
+
+    def run(self, filename: Path, since: float = 0.0) -> list[Annotation]:
+        return [
+            Annotation(str(filename), content=line, modified=100.0)
+            for line in filename.read_text().splitlines()
+            if since < 100.0
+        ]
+
+
+def test_watermarks_only_rise_and_persist(tmp_path: Path):
+    doc = Document(folder=str(tmp_path), data={"papis_id": "abc"})
+    sut = Watermarks(tmp_path / "marks.json")
+    sut.update(doc, [Annotation("f", modified=20.0), Annotation("f", modified=10.0)])
+    sut.update(doc, [Annotation("f", modified=15.0)])
+    sut.save()
+
+    assert Watermarks(tmp_path / "marks.json").get(doc) == 20.0
+    assert (
+        Watermarks(tmp_path / "marks.json").get(Document(data={"papis_id": "x"})) == 0.0
+    )
+
+
+def test_changes_shown_on_stdout_are_still_written_to_notes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    monkeypatch.setattr(cache, "default_folder", lambda: tmp_path / "cache")
+    (tmp_path / "annots.txt").write_text("my changed quote\n")
+    doc = papis.document.from_data(
+        {"title": "Title", "files": ["annots.txt"], "notes": "notes.md"}
+    )
+    doc.set_folder(str(tmp_path))
+
+    run([doc], None, [StampedExtractor()], changed_only=True)
+    assert "my changed quote" in capsys.readouterr().out
+    run([doc], None, [StampedExtractor()], write=True, changed_only=True)
+
+    assert "my changed quote" in (tmp_path / "notes.md").read_text()
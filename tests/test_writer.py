@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+from papis_extract.writer import BackgroundWriter
+
+
+@pytest.mark.parametrize("jobs", [0, 1, 4])
+def test_writes_of_a_key_stay_in_order(jobs: int):
+    written: dict[str, list[int]] = {"a": [], "b": []}
+
+    def write(key: str, nr: int) -> int:
+        time.sleep(0.001 * (nr % 3))
+        written[key].append(nr)
+        return nr
+
+    sut: BackgroundWriter[int] = BackgroundWriter(jobs, max_pending=5)
+    results: list[int] = []
+    for nr in range(20):
+        key = "ab"[nr % 2]
+        results += sut.submit(key, lambda key=key, nr=nr: write(key, nr))
+    results += sut.flush()
+
+    assert results == list(range(20))
+    assert written == {"a": list(range(0, 20, 2)), "b": list(range(1, 20, 2))}
+
+
+def test_limits_writes_in_flight():
+    release = threading.Event()
+    sut: BackgroundWriter[bool] = BackgroundWriter(2, max_pending=3)
+    sut.submit("a", release.wait)
+    sut.submit("b", release.wait)
+    timer = threading.Timer(0.05, release.set)
+    timer.start()
+
+    start = time.perf_counter()
+    sut.submit("c", lambda: True)
+
+    assert time.perf_counter() - start >= 0.04
+    sut.flush()
+
+
+def test_collects_errors_without_stopping_other_writes():
+    def fail() -> int:
+        raise OSError("disk full")
+
+    sut: BackgroundWriter[int] = BackgroundWriter(2)
+    results = sut.submit("a", fail) + sut.submit("b", lambda: 1) + sut.flush()
+
+    assert results == [1]
+    assert [(key, str(e)) for key, e in sut.errors] == [("a", "disk full")]